@@ -2,74 +2,51 @@ import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
-# ---- STEP 1: Load Raman Data ----
-file_path = "LHCE3-baselined.txt"
-data = np.loadtxt(file_path, skiprows=1)
-
-# Extract columns
-time = data[:, 0] / 3600  # Convert seconds to hours
-raman_shift = data[:, 1]
-intensity = data[:, 2]
-
-# ---- STEP 2: Apply Time Filter (0 to 18 Hours) ----
-time_mask = (time >= 0) & (time <= 18)
-filtered_data = data[time_mask]
-
-time_filtered = filtered_data[:, 0] / 3600
-raman_shift_filtered = filtered_data[:, 1]
-intensity_filtered = filtered_data[:, 2]
-
-# ---- STEP 3: Process Data for 1200-1700 cm⁻¹ ----
-mask_1200_1700 = (raman_shift_filtered >= 1200) & (raman_shift_filtered <= 1700)
-data_1200_1700 = filtered_data[mask_1200_1700]
+from grid_cache import processed_grid
+from potential import load_potential, potential_at
+from profiling import profile_stage, script_profiler
+from raman_plots import plot_contour_map, plot_waterfall_surface
 
-time_1200_1700 = data_1200_1700[:, 0] / 3600
-raman_shift_1200_1700 = data_1200_1700[:, 1]
-intensity_1200_1700 = data_1200_1700[:, 2]
+# Stage timings on stderr at exit when run with RAMAN_PROFILE set
+profiler = script_profiler("2D plot")
 
-# ---- STEP 4: Normalize Intensity ----
-intensity_max = np.max(intensity_1200_1700)
-intensity_1200_1700_normalized = intensity_1200_1700 / intensity_max
-
-# ---- STEP 5: Create 2D Grid for Intensity Matrix ----
-unique_times = np.unique(time_filtered)
-unique_shifts_1200_1700 = np.unique(raman_shift_1200_1700)
-
-intensity_matrix_1200_1700 = np.zeros((len(unique_times), len(unique_shifts_1200_1700)))
+# ---- STEP 1: Raman Data File ----
+file_path = "LHCE3-baselined.txt"
 
-# Fill intensity matrix for 1200-1700 cm⁻¹
-for i, t in enumerate(unique_times):
-    for j, shift in enumerate(unique_shifts_1200_1700):
-        mask = (time_1200_1700 == t) & (raman_shift_1200_1700 == shift)
-        if np.any(mask):
-            intensity_matrix_1200_1700[i, j] = intensity_1200_1700_normalized[mask][0]
+# ---- STEP 2: Read Spectra for 0 to 18 Hours, 1200-1700 cm⁻¹ ----
+# Rows = time (hours), columns = Raman shift, normalized by the max intensity
+# after cosmic-ray spikes are replaced (one spike would otherwise set the scale).
+# The processed grid is cached on disk, re-running after a cosmetic change
+# (colormap, labels ...) skips the loading and gridding
+unique_times, unique_shifts_1200_1700, intensity_matrix_1200_1700 = processed_grid(
+    file_path, shift_window=(1200, 1700), time_range=(0, 18), normalize="max", despike=True, profiler=profiler
+)
 
-# ---- STEP 6: Create 3D Waterfall Plot ----
+# ---- STEP 3: Create 3D Waterfall Plot ----
 fig = plt.figure(figsize=(12, 8))
 
 # First Plot: 1200-1700 cm⁻¹ (Raman Waterfall Plot)
 ax1 = fig.add_subplot(121, projection='3d')
-X_1200_1700, Y_1200_1700 = np.meshgrid(unique_shifts_1200_1700, unique_times)
-Z_1200_1700 = intensity_matrix_1200_1700
-
-# Plot surface
-ax1.plot_surface(X_1200_1700, Y_1200_1700, Z_1200_1700, cmap="plasma")
 
-ax1.set_xlabel("Raman Shift (cm⁻¹)")
-ax1.set_ylabel("Time (hours)")
-ax1.set_zlabel("Normalized Intensity")
-ax1.set_title("D and G band evolution during 1st Discharge")
+# Plot surface, decimated to a polygon budget so long runs stay responsive
+# (the D and G band maxima are kept, see raman_grid.decimate_surface)
+with profile_stage(profiler, "surface"):
+    plot_waterfall_surface(
+        ax1, unique_shifts_1200_1700, unique_times, intensity_matrix_1200_1700,
+        cmap="plasma", title="D and G band evolution during 1st Discharge", max_polygons=20000
+    )
 
-# ---- STEP 7: Create 2D Potential vs Time Plot on (110) Plane ----
+# ---- STEP 4: Create 2D Potential vs Time Plot on (110) Plane ----
 ax2 = fig.add_subplot(122, projection='3d')
 
 # Load potential data
 potential_file_path = "potential_data_LHCE3.txt"
-potential_data = np.loadtxt(potential_file_path, skiprows=1)
+with profile_stage(profiler, "potential"):
+    time_potential, potential = load_potential(potential_file_path)  # Time already in hours
 
-# Extract potential data
-time_potential = potential_data[:, 0]  # Already in hours
-potential = potential_data[:, 1]
+# Potential of every spectrum, interpolated at its acquisition time (same
+# hours as the Raman grid); spectra outside the potential record get NaN
+spectrum_potential = potential_at(unique_times, time_potential, potential, mode="interp")
 
 # Apply the same time filter for potential data
 potential_time_filtered = time_potential[(time_potential >= 0) & (time_potential <= 18)]
@@ -82,6 +59,8 @@ Z_for_plot = np.zeros_like(potential_for_plot)  # Z values set to 0 to ground th
 
 # **Swapped Axes: Time on Y, Potential on X**
 ax2.plot(potential_for_plot, time_for_plot, Z_for_plot, color='green')
+# One marker per spectrum, where it sits on the potential trace
+ax2.scatter(spectrum_potential, unique_times, np.zeros_like(unique_times), color='black', s=4)
 
 # Set labels (Swapped)
 ax2.set_xlabel('Potential (V)')   # Now X-axis
@@ -109,7 +88,23 @@ ax2.xaxis.pane.set_edgecolor('w')
 ax2.yaxis.pane.set_edgecolor('w')
 ax2.zaxis.pane.set_edgecolor('w')
 
-# ---- STEP 8: Display the Combined Plot ----
 plt.tight_layout()  # Adjust layout for better spacing
-plt.savefig("combined_plot_with_potential_swapped_axes.png", format="png")  # Save the plot
+with profile_stage(profiler, "savefig"):
+    plt.savefig("combined_plot_with_potential_swapped_axes.png", format="png")  # Save the plot
+
+# ---- STEP 5: Potential vs Raman Shift Map ----
+# The same spectra with their potential on the y axis, in order of potential
+# (contourf needs a monotonic axis); spectra without a potential are left out
+by_potential = np.argsort(spectrum_potential)
+by_potential = by_potential[np.isfinite(spectrum_potential[by_potential])]
+fig_potential, ax3 = plt.subplots(figsize=(8, 6))
+plot_contour_map(
+    ax3, unique_shifts_1200_1700, spectrum_potential[by_potential], intensity_matrix_1200_1700[by_potential],
+    title="Operando Raman Map vs Potential (1200-1700 cm⁻¹)", invert_time=False
+)
+ax3.set_ylabel("Potential (V)")
+fig_potential.tight_layout()
+fig_potential.savefig("potential_vs_shift_map.png", format="png")
+
+# ---- STEP 6: Display the Plots ----
 plt.show()
@@ -1,62 +1,29 @@
-import numpy as np
 import matplotlib.pyplot as plt
 
+from raman_grid import extract_windows
+from spectrum_index import read_time_range
+
 # ---- STEP 1: Load Data ----
 file_path = r"C:\Users\StdUser\PycharmProjects\PythonProject\LHCE3.txt"
-data = np.loadtxt(file_path, skiprows=1)
+# Only the spectra from 0 to 18 hours are parsed, the spectrum offset index
+# next to the file tells where they are. workers=1 parses in this process: a
+# worker pool needs an ``if __name__ == "__main__":`` guard on Windows
+data = read_time_range(file_path, time_range=(0, 18), time_unit=3600, workers=1)
 
 # Extract columns
 time = data[:, 0] / 3600  # Convert seconds to hours
 raman_shift = data[:, 1]
 intensity = data[:, 2]
 
-# ---- STEP 2: Apply Time Filter (0 to 18 Hours) ----
-time_mask = (time >= 0) & (time <= 18)
-filtered_data = data[time_mask]
-
-time_filtered = filtered_data[:, 0] / 3600
-raman_shift_filtered = filtered_data[:, 1]
-intensity_filtered = filtered_data[:, 2]
-
-# ---- STEP 3: Process Data for Two Ranges ----
-# (A) For 1000-1750 cm⁻¹
-mask_1000_1750 = (raman_shift_filtered >= 1000) & (raman_shift_filtered <= 1750)
-data_1000_1750 = filtered_data[mask_1000_1750]
-
-time_1000_1750 = data_1000_1750[:, 0] / 3600
-raman_shift_1000_1750 = data_1000_1750[:, 1]
-intensity_1000_1750 = data_1000_1750[:, 2]
-
-# (B) For 150-300 cm⁻¹
-mask_150_300 = (raman_shift_filtered >= 150) & (raman_shift_filtered <= 300)
-data_150_300 = filtered_data[mask_150_300]
-
-time_150_300 = data_150_300[:, 0] / 3600
-raman_shift_150_300 = data_150_300[:, 1]
-intensity_150_300 = data_150_300[:, 2]
-
-# ---- STEP 4: Create 2D Grids ----
-unique_times = np.unique(time_filtered)
-unique_shifts_1000_1750 = np.unique(raman_shift_1000_1750)
-unique_shifts_150_300 = np.unique(raman_shift_150_300)
-
-# Create intensity matrices
-intensity_matrix_1000_1750 = np.zeros((len(unique_times), len(unique_shifts_1000_1750)))
-intensity_matrix_150_300 = np.zeros((len(unique_times), len(unique_shifts_150_300)))
-
-# Fill intensity matrices
-for i, t in enumerate(unique_times):
-    for j, shift in enumerate(unique_shifts_1000_1750):
-        mask = (time_1000_1750 == t) & (raman_shift_1000_1750 == shift)
-        if np.any(mask):
-            intensity_matrix_1000_1750[i, j] = intensity_1000_1750[mask][0]
-
-    for j, shift in enumerate(unique_shifts_150_300):
-        mask = (time_150_300 == t) & (raman_shift_150_300 == shift)
-        if np.any(mask):
-            intensity_matrix_150_300[i, j] = intensity_150_300[mask][0]
+# ---- STEP 2: Create 2D Grids for Two Ranges (0 to 18 Hours) ----
+# (A) 1000-1750 cm⁻¹ and (B) 150-300 cm⁻¹ are gridded in a single pass, both
+# matrices are views into one shared grid (rows = time, columns = Raman shift)
+unique_times, windows = extract_windows(
+    time, raman_shift, intensity, [(1000, 1750), (150, 300)], time_window=(0, 18)
+)
+(unique_shifts_1000_1750, intensity_matrix_1000_1750), (unique_shifts_150_300, intensity_matrix_150_300) = windows
 
-# ---- STEP 5: Create Side-by-Side Contour Plots ----
+# ---- STEP 3: Create Side-by-Side Contour Plots ----
 fig, axes = plt.subplots(1, 2, figsize=(18, 6))
 
 # First Plot: 1000-1750 cm⁻¹
@@ -0,0 +1,201 @@
+"""Baseline correction of whole (time x shift) grids.
+
+Produces the "-baselined" exports read by '2D plot.py' and
+'3D waterfall-1st discharge.py', e.g.
+
+    python baseline.py LHCE3.txt -o LHCE3-baselined.txt --method als --lam 1e5 --p 0.01
+
+Methods work on every spectrum of the grid at once:
+
+als        -- asymmetric least squares (Eilers & Boelens), one banded
+              Cholesky solve per spectrum and iteration, spread over processes
+polynomial -- iterative modified polynomial fit, one batched least-squares
+              solve for all spectra per iteration
+rollingball -- morphological opening (rolling minimum then maximum) along the
+              shift axis, smoothed, vectorized over all spectra
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.linalg import solveh_banded
+from scipy.ndimage import maximum_filter1d, minimum_filter1d, uniform_filter1d
+
+from raman_grid import pivot_to_grid
+from raman_io import load_table
+
+BASELINE_METHODS = ("als", "polynomial", "rollingball")
+
+
+def _fill_gaps(intensity_matrix):
+    # Linear interpolation over NaN cells inside each spectrum
+    intensity_matrix = np.array(intensity_matrix, dtype=float)
+    columns = np.arange(intensity_matrix.shape[1])
+    for row in np.flatnonzero(np.isnan(intensity_matrix).any(axis=1)):
+        values = intensity_matrix[row]
+        known = ~np.isnan(values)
+        if known.any():
+            values[~known] = np.interp(columns[~known], columns[known], values[known])
+    return intensity_matrix
+
+
+def _second_difference_bands(n, lam):
+    # Upper banded form of lam * D'D for the second-difference matrix D,
+    # summed row by row of D (stencil 1, -2, 1) so that short axes are right too
+    stencil = (1.0, -2.0, 1.0)
+    bands = np.zeros((3, n))
+    for a in range(3):
+        for b in range(a, 3):
+            bands[2 - (b - a), b:n - 2 + b] += lam * stencil[a] * stencil[b]
+    return bands
+
+
+def _als_rows(rows, lam, p, n_iter):
+    baselines = np.empty_like(rows)
+    penalty = _second_difference_bands(rows.shape[1], lam)
+    for k, y in enumerate(rows):
+        # Missing cells get zero weight and are simply bridged by the baseline
+        known = ~np.isnan(y)
+        y = np.where(known, y, 0.0)
+        weights = known.astype(float)
+        for _ in range(n_iter):
+            bands = penalty.copy()
+            bands[2] += weights
+            z = solveh_banded(bands, weights * y)
+            new_weights = np.where(y > z, p, 1 - p) * known
+            if np.array_equal(new_weights, weights):
+                break
+            weights = new_weights
+        baselines[k] = z
+    return baselines
+
+
+def als_baseline(intensity_matrix, lam=1e5, p=0.01, n_iter=10, workers=1):
+    """Asymmetric least squares baseline of every spectrum (row).
+
+    lam -- smoothness (larger is stiffer), p -- weight of points above the
+    baseline. With ``workers`` > 1 the rows are split over a process pool;
+    None uses one worker per core.
+    """
+    intensity_matrix = np.asarray(intensity_matrix, dtype=float)
+    if intensity_matrix.shape[1] < 3:
+        return np.array(intensity_matrix)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1:
+        # A few blocks per worker so uneven convergence still balances
+        blocks = np.array_split(intensity_matrix, workers * 4)
+        blocks = [block for block in blocks if len(block)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_als_rows, blocks, *zip(*[(lam, p, n_iter)] * len(blocks)))
+            return np.concatenate(list(results))
+    return _als_rows(intensity_matrix, lam, p, n_iter)
+
+
+def polynomial_baseline(intensity_matrix, unique_shifts, degree=3, n_iter=50, tol=1e-4):
+    """Iterative modified polynomial baseline, all spectra per solve.
+
+    Each iteration fits one polynomial per spectrum in a single least-squares
+    call, then clips every spectrum to its fit so peaks stop pulling it up.
+    """
+    y = _fill_gaps(intensity_matrix)
+    x = np.asarray(unique_shifts, dtype=float)
+    # Scaled axis keeps the Vandermonde matrix well conditioned
+    x = (x - x.mean()) / (np.ptp(x) or 1.0)
+    vander = np.vander(x, degree + 1)
+    fit_matrix = np.linalg.pinv(vander)
+
+    baseline = y
+    for _ in range(n_iter):
+        fitted = (fit_matrix @ baseline.T).T @ vander.T
+        clipped = np.minimum(baseline, fitted)
+        converged = np.linalg.norm(clipped - baseline) <= tol * np.linalg.norm(baseline)
+        baseline = clipped
+        if converged:
+            break
+    return (fit_matrix @ baseline.T).T @ vander.T
+
+
+def rolling_ball_baseline(intensity_matrix, radius=50, smooth=None):
+    """Rolling-ball style baseline: opening with a ``radius``-point window.
+
+    A rolling minimum followed by a rolling maximum along the shift axis,
+    then a moving average of ``smooth`` points (default: radius) to remove
+    the flat steps. Radius is in points, not cm⁻¹.
+    """
+    y = _fill_gaps(intensity_matrix)
+    size = 2 * radius + 1
+    opened = maximum_filter1d(minimum_filter1d(y, size, axis=1, mode="nearest"), size, axis=1, mode="nearest")
+    smooth = radius if smooth is None else smooth
+    if smooth > 1:
+        opened = uniform_filter1d(opened, smooth, axis=1, mode="nearest")
+    return np.minimum(opened, y)
+
+
+def subtract_baseline(unique_shifts, intensity_matrix, method="als", **options):
+    """Return ``(corrected, baseline)`` for a (time x shift) grid."""
+    if method == "als":
+        baseline = als_baseline(intensity_matrix, **options)
+    elif method == "polynomial":
+        baseline = polynomial_baseline(intensity_matrix, unique_shifts, **options)
+    elif method == "rollingball":
+        baseline = rolling_ball_baseline(intensity_matrix, **options)
+    else:
+        raise ValueError(f"method must be one of {BASELINE_METHODS}, got {method!r}")
+    return np.asarray(intensity_matrix) - baseline, baseline
+
+
+def write_long_format(file_path, unique_times, unique_shifts, intensity_matrix):
+    """Write a grid back as a Time / Ramanshift / Intensity text export.
+
+    Spectra are written in time order with descending shift like the
+    spectrometer exports; missing (NaN) cells are left out.
+    """
+    columns = np.arange(len(unique_shifts))[::-1]
+    time = np.repeat(unique_times, len(columns))
+    shift = np.tile(np.asarray(unique_shifts)[columns], len(unique_times))
+    intensity = np.asarray(intensity_matrix)[:, columns].ravel()
+    keep = ~np.isnan(intensity)
+    np.savetxt(file_path, np.column_stack([time[keep], shift[keep], intensity[keep]]),
+               fmt="%.6f", delimiter="\t", header="Time\t\tRamanshift\tIntensity", comments="")
+
+
+def baseline_file(file_path, out_path, method="als", **options):
+    """Baseline a whole export; writes ``out_path`` and a ``.npz`` grid next to it."""
+    data = load_table(file_path)
+    unique_times, unique_shifts, intensity_matrix = pivot_to_grid(data[:, 0], data[:, 1], data[:, 2], missing=np.nan)
+    corrected, baseline = subtract_baseline(unique_shifts, intensity_matrix, method, **options)
+    corrected[np.isnan(intensity_matrix)] = np.nan
+
+    write_long_format(out_path, unique_times, unique_shifts, corrected)
+    np.savez(out_path.rsplit(".", 1)[0] + ".npz", unique_times=unique_times, unique_shifts=unique_shifts,
+             intensity_matrix=corrected, baseline=baseline)
+    return unique_times, unique_shifts, corrected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Baseline-correct a Time/Ramanshift/Intensity export.")
+    parser.add_argument("file_path")
+    parser.add_argument("-o", "--output", help="output export (default: <name>-baselined.txt)")
+    parser.add_argument("--method", choices=BASELINE_METHODS, default="als")
+    parser.add_argument("--lam", type=float, default=1e5, help="ALS smoothness")
+    parser.add_argument("--p", type=float, default=0.01, help="ALS asymmetry")
+    parser.add_argument("--degree", type=int, default=3, help="polynomial degree")
+    parser.add_argument("--radius", type=int, default=50, help="rolling ball radius in points")
+    parser.add_argument("--workers", type=int, default=None, help="ALS worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if args.method == "als":
+        options = dict(lam=args.lam, p=args.p, workers=args.workers)
+    elif args.method == "polynomial":
+        options = dict(degree=args.degree)
+    else:
+        options = dict(radius=args.radius)
+    out_path = args.output or args.file_path.rsplit(".", 1)[0] + "-baselined.txt"
+    baseline_file(args.file_path, out_path, args.method, **options)
+    print(out_path)
+
+
+if __name__ == "__main__":
+    main()
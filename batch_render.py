@@ -0,0 +1,187 @@
+"""Render Raman maps for many exports at once, without a display.
+
+Example (every export in a folder, two windows, contour and waterfall):
+
+    python batch_render.py "data/*.txt" --window 1000 1750 --window 150 300 \
+        --time-range 0 18 --kind contour --kind waterfall --out-dir figures
+
+The same settings can come from a JSON job spec with ``--spec jobs.json``:
+
+    {"windows": [[1000, 1750], [150, 300]], "time_ranges": [[0, 18], [18, 36]],
+     "kinds": ["contour", "waterfall"], "render": "raster", "dpi": 150}
+
+Options given on the command line override the spec; ``--time-range`` can
+be repeated like ``--window``, and a single ``"time_range"`` in the spec is
+still accepted. Every (file, window, time range, kind) combination is one
+job with its own PNG, and jobs are spread over a process pool. Files that
+are not Time/Ramanshift/Intensity exports are skipped without failing the run.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 (registers the 3d projection)
+
+from normalization import normalize_grid
+from raman_grid import extract_windows
+from raman_io import load_table
+from raman_plots import RENDER_MODES, plot_contour_map, plot_waterfall_lines, plot_waterfall_surface
+
+PLOT_KINDS = ("contour", "waterfall", "lines")
+
+DEFAULT_SPEC = {
+    "windows": [[1000, 1750]],
+    "time_ranges": [None],
+    "time_unit": 3600,
+    "kinds": ["contour"],
+    "levels": 100,
+    "render": "contour",
+    "cmap": "plasma",
+    "dpi": 150,
+}
+
+
+def output_path(out_dir, file_path, kind, window, time_range=None):
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    name = f"{stem}_{kind}_{window[0]:g}_{window[1]:g}"
+    if time_range is not None:
+        name += f"_{time_range[0]:g}-{time_range[1]:g}h"
+    return os.path.join(out_dir, name + ".png")
+
+
+def time_ranges(spec):
+    """The spec's time windows as a list, None meaning the whole run."""
+    ranges = [spec["time_range"]] if "time_range" in spec else spec["time_ranges"]
+    return [None if time_range is None else tuple(time_range) for time_range in ranges]
+
+
+def render_job(file_path, window, time_range, kind, spec, out_path):
+    """Grid one window and time range of one export and save it as a PNG. Runs in a worker."""
+    data = load_table(file_path)
+    time = data[:, 0] / spec["time_unit"]
+    unique_times, windows = extract_windows(
+        time, data[:, 1], data[:, 2], [window], time_window=time_range
+    )
+    unique_shifts, intensity_matrix = windows[0]
+    if intensity_matrix.size == 0:
+        raise ValueError(f"no data in {window[0]:g}-{window[1]:g} cm⁻¹")
+
+    title_window = f"({window[0]:g}-{window[1]:g} cm⁻¹)"
+    if kind == "contour":
+        fig = Figure(figsize=(8, 6))
+        ax = fig.add_subplot(111)
+        plot_contour_map(ax, unique_shifts, unique_times, intensity_matrix,
+                         levels=spec["levels"], cmap=spec["cmap"],
+                         title=f"Operando Raman Contour Map {title_window}",
+                         time_limits=time_range, render=spec["render"])
+    else:
+        fig = Figure(figsize=(12, 8))
+        ax = fig.add_subplot(111, projection='3d')
+        plot_waterfall = plot_waterfall_surface if kind == "waterfall" else plot_waterfall_lines
+        plot_waterfall(ax, unique_shifts, unique_times, normalize_grid(intensity_matrix, "max"),
+                       cmap=spec["cmap"], title=f"D and G band evolution {title_window}")
+
+    fig.tight_layout()
+    fig.savefig(out_path, format="png", dpi=spec["dpi"])
+    return out_path
+
+
+def build_jobs(patterns, spec, out_dir):
+    files = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+    jobs = []
+    for file_path in files:
+        for window in spec["windows"]:
+            for time_range in time_ranges(spec):
+                for kind in spec["kinds"]:
+                    jobs.append((file_path, tuple(window), time_range, kind, spec,
+                                 output_path(out_dir, file_path, kind, window, time_range)))
+    return jobs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch render operando Raman maps headlessly.")
+    parser.add_argument("patterns", nargs="+", help="glob pattern(s) of Time/Ramanshift/Intensity exports")
+    parser.add_argument("--spec", help="JSON job spec (windows, time_ranges, kinds, levels, render, cmap, dpi)")
+    parser.add_argument("--window", nargs=2, type=float, action="append", metavar=("LOW", "HIGH"),
+                        help="Raman shift window in cm⁻¹, can be repeated")
+    parser.add_argument("--time-range", nargs=2, type=float, action="append", metavar=("START", "END"),
+                        help="time window in hours, can be repeated")
+    parser.add_argument("--kind", choices=PLOT_KINDS, action="append", help="plot kind, can be repeated")
+    parser.add_argument("--render", choices=RENDER_MODES,
+                        help="draw contour maps with contourf or as a downsampled raster image")
+    parser.add_argument("--dpi", type=int)
+    parser.add_argument("--out-dir", default="figures")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    spec = dict(DEFAULT_SPEC)
+    if args.spec:
+        with open(args.spec, encoding="utf-8") as f:
+            spec.update(json.load(f))
+    if args.window:
+        spec["windows"] = args.window
+    if args.time_range:
+        spec.pop("time_range", None)
+        spec["time_ranges"] = args.time_range
+    if args.kind:
+        spec["kinds"] = args.kind
+    if args.render:
+        spec["render"] = args.render
+    if args.dpi:
+        spec["dpi"] = args.dpi
+    for kind in spec["kinds"]:
+        if kind not in PLOT_KINDS:
+            raise SystemExit(f"unknown plot kind {kind!r}, expected one of {PLOT_KINDS}")
+
+    jobs = build_jobs(args.patterns, spec, args.out_dir)
+    if not jobs:
+        raise SystemExit("no files matched " + " ".join(args.patterns))
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    # Parse every file once up front so the workers all hit the binary cache.
+    # Files that are not exports (other text files matched by the pattern)
+    # are skipped; only files that cannot be read or rendered are failures
+    failures = 0
+    skipped = 0
+    for file_path in sorted({job[0] for job in jobs}):
+        try:
+            if load_table(file_path).shape[1] < 3:
+                raise ValueError("not a Time/Ramanshift/Intensity export")
+        except ValueError as error:
+            skipped += 1
+            print(f"SKIPPED {file_path}: {error}", file=sys.stderr)
+        except OSError as error:
+            failures += 1
+            print(f"FAILED {file_path}: {error}", file=sys.stderr)
+        else:
+            continue
+        jobs = [job for job in jobs if job[0] != file_path]
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(render_job, *job): job for job in jobs}
+        for future in as_completed(futures):
+            file_path, window, time_range, kind = futures[future][:4]
+            try:
+                print(future.result())
+            except Exception as error:
+                failures += 1
+                print(f"FAILED {file_path} {kind} {window} {time_range or ''}: {error}", file=sys.stderr)
+    if skipped:
+        print(f"{skipped} file(s) skipped", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
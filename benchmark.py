@@ -0,0 +1,135 @@
+"""Benchmark the Raman processing pipeline stage by stage.
+
+Runs the scripts' own pipeline -- ``grid_cache.processed_grid`` (grid,
+despike, normalize), ``raman_plots.plot_contour_map`` and savefig -- on
+synthetic exports of increasing size and on the bundled export, and reports
+where the time and memory go:
+
+    python benchmark.py --sizes 10 100 1000 10000 --json bench.json
+    python benchmark.py --sizes 10 100 --compare bench.json
+
+The stages are the ones the pipeline functions time themselves (see
+``profiling``), so a script run with RAMAN_PROFILE set reports the same
+stages as the benchmark.
+
+Synthetic exports (N spectra x 1700 shifts from ``synthetic.py``) are
+written once to .raman_cache/bench and reused. With ``--compare`` every
+stage is shown next to the same stage of an earlier JSON dump, so
+regressions and wins are visible at a glance.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from matplotlib.figure import Figure
+
+from grid_cache import processed_grid
+from profiling import StageProfiler
+from raman_io import CACHE_DIR_NAME
+from raman_plots import RENDER_MODES, plot_contour_map
+from synthetic import write_raman_export
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_FILES = ("ECDEC-charge-discharge.txt",)
+
+
+def synthetic_export(n_spectra, n_shifts=1700, data_dir=None):
+    """Path of a cached synthetic export, written on first use."""
+    data_dir = data_dir or os.path.join(CACHE_DIR_NAME, "bench")
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = os.path.join(data_dir, f"synthetic_{n_spectra}x{n_shifts}.txt")
+    if not os.path.exists(file_path):
+        write_raman_export(file_path + ".tmp", n_spectra, n_shifts, spike_rate=0.05)
+        os.replace(file_path + ".tmp", file_path)
+    return file_path
+
+
+def run_pipeline(file_path, profiler, shift_window=None, time_range=None, time_unit=3600,
+                 render="contour", levels=100, memo=False, despike=False, resample_step=None, out_path=None):
+    """Grid and plot one export like the contour-map scripts, stage by stage.
+
+    Without ``memo`` the grid is built every run; with it the processed-grid
+    memo of ``grid_cache`` is used (built on the first run, read afterwards).
+    """
+    unique_times, unique_shifts, intensity_matrix = processed_grid(
+        file_path, shift_window=shift_window, time_range=time_range, time_unit=time_unit,
+        normalize="max", despike=despike, resample_step=resample_step,
+        cache=None if memo else False, profiler=profiler,
+    )
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.add_subplot(111)
+    with profiler.stage(render):
+        plot_contour_map(ax, unique_shifts, unique_times, intensity_matrix, levels=levels, render=render)
+
+    with profiler.stage("savefig"):
+        fig.savefig(out_path or io.BytesIO(), format="png", dpi=150)
+    return intensity_matrix.shape
+
+
+def compare(runs, previous):
+    """Text table of every stage's time against the same stage in ``previous`` runs."""
+    before = {(run["name"], record["stage"]): record["seconds"]
+              for run in previous for record in run["stages"]}
+    lines = [f"{'run':<32}{'stage':<12}{'before':>10}{'now':>10}{'ratio':>8}"]
+    for run in runs:
+        for record in run["stages"]:
+            old = before.get((run["name"], record["stage"]))
+            if old is None:
+                continue
+            ratio = record["seconds"] / old if old else float("inf")
+            lines.append(f"{run['name']:<32}{record['stage']:<12}{old:>10.3f}{record['seconds']:>10.3f}{ratio:>8.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stage-level benchmark of the Raman pipeline.")
+    parser.add_argument("--sizes", nargs="*", type=int, default=list(DEFAULT_SIZES),
+                        help="numbers of synthetic spectra")
+    parser.add_argument("--shifts", type=int, default=1700, help="points per synthetic spectrum")
+    parser.add_argument("--files", nargs="*", default=list(DEFAULT_FILES), help="real exports to include")
+    parser.add_argument("--render", choices=RENDER_MODES, default="contour")
+    parser.add_argument("--memo", action="store_true",
+                        help="use the processed-grid memo of grid_cache instead of building every run")
+    parser.add_argument("--despike", action="store_true", help="remove cosmic-ray spikes like the scripts")
+    parser.add_argument("--resample-step", help='resample onto a common axis ("auto" or a step in cm⁻¹)')
+    parser.add_argument("--no-memory", action="store_true", help="times only, without tracemalloc")
+    parser.add_argument("--data-dir", help="where synthetic exports are kept")
+    parser.add_argument("--json", help="write all runs to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON dump to compare against")
+    args = parser.parse_args(argv)
+
+    datasets = [(f"synthetic {n}x{args.shifts}", lambda n=n: synthetic_export(n, args.shifts, args.data_dir))
+                for n in args.sizes]
+    datasets += [(os.path.basename(path), lambda path=path: path) for path in args.files if os.path.exists(path)]
+
+    runs = []
+    for name, get_path in datasets:
+        file_path = get_path()
+        profiler = StageProfiler(name, trace_memory=not args.no_memory)
+        resample_step = args.resample_step
+        if resample_step not in (None, "auto"):
+            resample_step = float(resample_step)
+        shape = run_pipeline(file_path, profiler, render=args.render, memo=args.memo, despike=args.despike,
+                             resample_step=resample_step)
+        print(profiler.summary(), flush=True)
+        runs.append(profiler.to_dict(file=file_path, grid_shape=list(shape), render=args.render,
+                                     memo=args.memo, despike=args.despike, resample_step=resample_step))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(runs, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(runs, json.load(f)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import json
+
+import numpy as np
+
+from raman_io import stream_to_grid
+
+# Compact in-memory and on-disk form of a (time x shift) grid: a float32 (or
+# float16) intensity matrix plus the two 1D axes, instead of three float64
+# columns that repeat Time and Ramanshift on every row.
+#
+#     grid = CompactGrid.from_export("LHCE3.txt", shift_range=(1200, 1700))
+#     grid.save("LHCE3.rgrid")
+#     unique_times, unique_shifts, intensity_matrix = CompactGrid.load("LHCE3.rgrid")
+
+GRID_MAGIC = b"RAMANGRID1\n"
+COMPACT_DTYPES = ("float32", "float16")
+
+# Array blocks start on this boundary so the memory-mapped matrix is aligned
+_ALIGN = 64
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+class CompactGrid:
+    """(time x shift) intensities in reduced precision with their axes and metadata.
+
+    The axes stay float64 (they are small and times in seconds need the
+    precision); only the matrix is stored as ``dtype``. Unpacks like the
+    other grid helpers: ``unique_times, unique_shifts, intensity_matrix = grid``.
+    ``metadata`` is a JSON-serializable dict (source file, units, windows ...).
+    """
+
+    __slots__ = ("unique_times", "unique_shifts", "intensity_matrix", "metadata")
+
+    def __init__(self, unique_times, unique_shifts, intensity_matrix, metadata=None, dtype="float32"):
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(f"dtype must be one of {COMPACT_DTYPES}, got {dtype!r}")
+        intensity_matrix = np.asarray(intensity_matrix)
+        if intensity_matrix.shape != (len(unique_times), len(unique_shifts)):
+            raise ValueError(f"matrix shape {intensity_matrix.shape} does not match the axes "
+                             f"({len(unique_times)}, {len(unique_shifts)})")
+        if dtype == "float16" and np.nanmax(np.abs(intensity_matrix), initial=0.0) > np.finfo(np.float16).max:
+            raise ValueError("intensities overflow float16, normalize the grid first or use float32")
+        self.unique_times = np.asarray(unique_times, dtype=float)
+        self.unique_shifts = np.asarray(unique_shifts, dtype=float)
+        self.intensity_matrix = intensity_matrix.astype(dtype, copy=False)
+        self.metadata = dict(metadata or {})
+
+    @classmethod
+    def from_export(cls, file_path, shift_range=None, time_range=None, time_unit=3600, dtype="float32",
+                    missing=np.nan):
+        """Stream a Time / Ramanshift / Intensity export straight into a compact grid."""
+        unique_times, unique_shifts, intensity_matrix = stream_to_grid(
+            file_path, shift_range=shift_range, time_range=time_range, time_unit=time_unit, missing=missing
+        )
+        metadata = dict(source=str(file_path), shift_range=shift_range, time_range=time_range,
+                        time_unit=time_unit)
+        return cls(unique_times, unique_shifts, intensity_matrix, metadata, dtype)
+
+    def __iter__(self):
+        return iter((self.unique_times, self.unique_shifts, self.intensity_matrix))
+
+    def __repr__(self):
+        rows, cols = self.intensity_matrix.shape
+        return f"CompactGrid({rows} spectra x {cols} shifts, {self.intensity_matrix.dtype}, {self.nbytes / 1e6:.1f} MB)"
+
+    @property
+    def nbytes(self):
+        return self.unique_times.nbytes + self.unique_shifts.nbytes + self.intensity_matrix.nbytes
+
+    def save(self, file_path):
+        """Write the grid as one binary file: a JSON header, then the raw arrays."""
+        arrays = [
+            ("unique_times", np.ascontiguousarray(self.unique_times, dtype="<f8")),
+            ("unique_shifts", np.ascontiguousarray(self.unique_shifts, dtype="<f8")),
+            ("intensity_matrix", np.ascontiguousarray(self.intensity_matrix,
+                                                      dtype=self.intensity_matrix.dtype.newbyteorder("<"))),
+        ]
+        # Offsets are relative to the aligned start of the data after the header
+        header = {"metadata": self.metadata, "arrays": {}}
+        position = 0
+        for name, array in arrays:
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+            position = _aligned(position + array.nbytes)
+        encoded = json.dumps(header).encode("utf-8")
+        data_start = _aligned(len(GRID_MAGIC) + 8 + len(encoded))
+
+        with open(file_path, "wb") as f:
+            f.write(GRID_MAGIC)
+            f.write(len(encoded).to_bytes(8, "little"))
+            f.write(encoded)
+            for name, array in arrays:
+                f.write(b"\0" * (data_start + header["arrays"][name]["offset"] - f.tell()))
+                array.tofile(f)
+
+    @classmethod
+    def load(cls, file_path, mmap_mode="r"):
+        """Read a file written by ``save``.
+
+        The matrix is memory-mapped unless ``mmap_mode`` is None; the default
+        "r" is read-only, use "c" to normalize a loaded grid in place
+        without touching the file.
+        """
+        with open(file_path, "rb") as f:
+            if f.read(len(GRID_MAGIC)) != GRID_MAGIC:
+                raise ValueError(f"{file_path} is not a compact grid file")
+            header_length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_length).decode("utf-8"))
+            data_start = _aligned(len(GRID_MAGIC) + 8 + header_length)
+            arrays = {}
+            for name, block in header["arrays"].items():
+                if name == "intensity_matrix" and mmap_mode is not None:
+                    continue
+                f.seek(data_start + block["offset"])
+                count = int(np.prod(block["shape"]))
+                arrays[name] = np.fromfile(f, dtype=block["dtype"], count=count).reshape(block["shape"])
+
+        block = header["arrays"]["intensity_matrix"]
+        if mmap_mode is not None and np.prod(block["shape"]) == 0:
+            arrays["intensity_matrix"] = np.empty(block["shape"], dtype=block["dtype"])
+        elif mmap_mode is not None:
+            arrays["intensity_matrix"] = np.memmap(file_path, dtype=block["dtype"], mode=mmap_mode,
+                                                   offset=data_start + block["offset"], shape=tuple(block["shape"]))
+        grid = cls.__new__(cls)
+        grid.unique_times = arrays["unique_times"]
+        grid.unique_shifts = arrays["unique_shifts"]
+        grid.intensity_matrix = arrays["intensity_matrix"]
+        grid.metadata = header["metadata"]
+        return grid
@@ -0,0 +1,200 @@
+"""Compare several cells in one figure, on shared axes and one color scale.
+
+Example (every cell export in a folder, first discharge, D and G region):
+
+    python compare_cells.py "cells/*.txt" --window 1000 1750 --time-range 0 18 --out compare.png
+
+Every export is loaded and gridded in a worker process onto the same Raman
+shift axis (and, with ``--time-range``, the same time base), normalized,
+and drawn in its own panel as soon as it is ready, so the figure is built
+while the other cells are still loading. All panels share their x and y
+axes and one colorbar.
+"""
+import argparse
+import glob
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+
+from normalization import NORMALIZE_MODES, normalize_grid, remove_spikes
+from raman_grid import resample_spectra, resample_times
+from raman_io import load_table
+from raman_plots import RENDER_MODES, draw_raster
+
+# Normalized grids in these modes lie in 0..1, so the color scale is known
+# before any cell is loaded and panels can be drawn as they arrive
+BOUNDED_MODES = ("max", "spectrum_max", "minmax")
+
+
+def shared_axes(window, shift_step=1.0, time_range=None, time_step=None):
+    """Common shift axis over ``window`` and, with a ``time_range``, a common time base.
+
+    ``time_step`` defaults to 1/500 of the time range. Returns
+    ``(shift_axis, time_axis)``, ``time_axis`` None without a time range.
+    """
+    n_shifts = int(math.floor((window[1] - window[0]) / shift_step + 1e-9)) + 1
+    shift_axis = window[0] + shift_step * np.arange(n_shifts)
+    if time_range is None:
+        return shift_axis, None
+    span = time_range[1] - time_range[0]
+    n_times = int(round(span / (time_step or span / 500))) + 1
+    return shift_axis, np.linspace(time_range[0], time_range[1], n_times)
+
+
+def load_cell(file_path, shift_axis, time_axis=None, time_unit=3600, normalize="max", despike=False, band=None):
+    """Grid one export on the shared axes; returns ``(unique_times, intensity_matrix)``. Runs in a worker.
+
+    ``band`` is the (low, high) reference band of the "band" normalization.
+    """
+    data = load_table(file_path)
+    time = data[:, 0] / time_unit
+    raman_shift = data[:, 1]
+    # A margin around the window keeps neighbours for interpolating at its edges
+    margin = 10 * (shift_axis[1] - shift_axis[0]) if len(shift_axis) > 1 else 10.0
+    keep = (raman_shift >= shift_axis[0] - margin) & (raman_shift <= shift_axis[-1] + margin)
+    if time_axis is not None:
+        keep &= (time >= time_axis[0]) & (time <= time_axis[-1])
+    unique_times, _, intensity_matrix = resample_spectra(time[keep], raman_shift[keep], data[keep, 2],
+                                                         shift_axis=shift_axis)
+    if despike:
+        remove_spikes(intensity_matrix)
+    if normalize is not None:
+        normalize_grid(intensity_matrix, normalize, shift_axis, band=band)
+    if time_axis is not None:
+        intensity_matrix = resample_times(unique_times, intensity_matrix, time_axis)
+        unique_times = time_axis
+    # float32 halves what travels back from the worker
+    return unique_times, intensity_matrix.astype(np.float32)
+
+
+def _cell_name(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def _draw_panel(ax, shift_axis, unique_times, intensity_matrix, norm, render, levels, cmap):
+    if render == "contour" and len(unique_times) > 1:
+        ax.contourf(shift_axis, unique_times, intensity_matrix, cmap=cmap, extend="both",
+                    levels=np.linspace(norm.vmin, norm.vmax, levels))
+    else:
+        draw_raster(ax, shift_axis, unique_times, intensity_matrix, cmap=cmap, norm=norm)
+
+
+def compare_cells(file_paths, window=(1000, 1750), time_range=None, time_unit=3600, shift_step=1.0,
+                  time_step=None, normalize="max", despike=False, render="raster", levels=100,
+                  cmap="plasma", color_limits=None, workers=None, band=None):
+    """Draw one map per export in a grid of panels; returns ``(fig, axes, failed)``.
+
+    ``failed`` lists the exports that could not be loaded (their panels
+    say so in the title).
+
+    band         -- (low, high) reference band in cm⁻¹ for normalize="band"
+    color_limits -- (vmin, vmax) of the shared color scale; by default 0..1
+                    for the bounded normalizations, otherwise the range of
+                    all cells (panels are then drawn once every cell is in)
+    """
+    if render not in RENDER_MODES:
+        raise ValueError(f"render must be one of {RENDER_MODES}, got {render!r}")
+    shift_axis, time_axis = shared_axes(window, shift_step, time_range, time_step)
+    if color_limits is None and normalize in BOUNDED_MODES:
+        color_limits = (0.0, 1.0)
+    norm = Normalize(*color_limits) if color_limits is not None else None
+
+    n_columns = math.ceil(math.sqrt(len(file_paths)))
+    n_rows = math.ceil(len(file_paths) / n_columns)
+    fig, axes = plt.subplots(n_rows, n_columns, figsize=(5 * n_columns, 4 * n_rows),
+                             sharex=True, sharey=True, squeeze=False)
+    for ax in axes.flat[len(file_paths):]:
+        ax.set_visible(False)
+
+    waiting = []
+    failed = []
+    time_limits = [np.inf, -np.inf]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(load_cell, file_path, shift_axis, time_axis, time_unit, normalize, despike, band):
+                (ax, file_path)
+            for ax, file_path in zip(axes.flat, file_paths)
+        }
+        for future in as_completed(futures):
+            ax, file_path = futures[future]
+            ax.set_title(_cell_name(file_path))
+            try:
+                unique_times, intensity_matrix = future.result()
+            except Exception as error:
+                failed.append(file_path)
+                print(f"FAILED {file_path}: {error}", file=sys.stderr)
+                ax.set_title(f"{_cell_name(file_path)} (failed)")
+                continue
+            if len(unique_times) == 0:
+                continue
+            time_limits = [min(time_limits[0], unique_times[0]), max(time_limits[1], unique_times[-1])]
+            if norm is None:
+                waiting.append((ax, unique_times, intensity_matrix))
+            else:
+                _draw_panel(ax, shift_axis, unique_times, intensity_matrix, norm, render, levels, cmap)
+
+    if norm is None:
+        low = min((np.nanmin(matrix) for _, _, matrix in waiting), default=0.0)
+        high = max((np.nanmax(matrix) for _, _, matrix in waiting), default=1.0)
+        norm = Normalize(low, high)
+        for ax, unique_times, intensity_matrix in waiting:
+            _draw_panel(ax, shift_axis, unique_times, intensity_matrix, norm, render, levels, cmap)
+
+    # The axes are shared, so these apply to every panel; time runs downwards
+    low, high = time_range or time_limits
+    if high > low:
+        axes[0, 0].set_ylim(high, low)
+    axes[0, 0].set_xlim(shift_axis[0], shift_axis[-1])
+    for ax in axes[-1]:
+        ax.set_xlabel("Raman Shift (cm⁻¹)")
+    for ax in axes[:, 0]:
+        ax.set_ylabel("Time (hours)")
+    colorbar = fig.colorbar(ScalarMappable(norm=norm, cmap=cmap), ax=axes.ravel().tolist())
+    colorbar.set_label("Intensity (a.u.)" if normalize is None else f"Intensity ({normalize} normalized)")
+    return fig, axes, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare operando Raman maps of several cells.")
+    parser.add_argument("patterns", nargs="+", help="glob pattern(s) of Time/Ramanshift/Intensity exports")
+    parser.add_argument("--window", nargs=2, type=float, default=(1000, 1750), metavar=("LOW", "HIGH"),
+                        help="Raman shift window in cm⁻¹")
+    parser.add_argument("--time-range", nargs=2, type=float, metavar=("START", "END"),
+                        help="time window in hours; also resamples every cell onto one time base")
+    parser.add_argument("--time-unit", type=float, default=3600, help="divisor of the Time column")
+    parser.add_argument("--shift-step", type=float, default=1.0, help="spacing of the shared shift axis")
+    parser.add_argument("--time-step", type=float, help="spacing of the shared time base in hours")
+    parser.add_argument("--normalize", choices=NORMALIZE_MODES + ("none",), default="max")
+    parser.add_argument("--band", nargs=2, type=float, metavar=("LOW", "HIGH"),
+                        help="reference band in cm⁻¹ for --normalize band, e.g. 1500 1650 for G")
+    parser.add_argument("--despike", action="store_true", help="remove cosmic-ray spikes first")
+    parser.add_argument("--render", choices=RENDER_MODES, default="raster")
+    parser.add_argument("--clim", nargs=2, type=float, metavar=("VMIN", "VMAX"), help="shared color scale")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", help="save the figure here instead of showing it")
+    args = parser.parse_args(argv)
+    if args.normalize == "band" and args.band is None:
+        parser.error("--normalize band needs --band LOW HIGH")
+
+    file_paths = sorted({path for pattern in args.patterns for path in glob.glob(pattern)})
+    if not file_paths:
+        raise SystemExit("no files matched " + " ".join(args.patterns))
+    fig, _, failed = compare_cells(file_paths, args.window, args.time_range, args.time_unit, args.shift_step,
+                                   args.time_step, None if args.normalize == "none" else args.normalize,
+                                   args.despike, args.render, color_limits=args.clim, workers=args.workers,
+                                   band=args.band)
+    if args.out:
+        fig.savefig(args.out, dpi=150)
+    else:
+        plt.show()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Generalized two-dimensional correlation spectroscopy (2D-COS, Noda).
+
+Example (first discharge, D and G region, potential as the perturbation):
+
+    python correlation2d.py LHCE3-baselined.txt --window 1200 1700 --time-range 0 18 \
+        --potential potential_data_LHCE3.txt --out cos2d.png
+
+The synchronous map shows which bands change together during the
+perturbation (time or potential). The asynchronous map shows which change
+out of step. By Noda's rules, when both are positive (or both negative) at
+(v1, v2), the band at v1 changes before the one at v2. Both maps are
+matrix products of the dynamic spectra, the asynchronous one through the
+Hilbert-Noda transform. They are computed over blocks of shifts, and only
+the blocks on and above the diagonal are multiplied.
+"""
+import argparse
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+from scipy.signal import fftconvolve
+
+from grid_cache import processed_grid
+from potential import load_potential, potential_at
+from raman_grid import resample_times
+from raman_plots import RENDER_MODES, plot_correlation_map
+
+REFERENCE_MODES = ("mean", "first", "last", "none")
+
+
+def dynamic_spectra(intensity_matrix, reference="mean"):
+    """Spectra minus a reference spectrum, as a new float64 matrix; missing cells become 0."""
+    if reference not in REFERENCE_MODES:
+        raise ValueError(f"reference must be one of {REFERENCE_MODES}, got {reference!r}")
+    dynamic = np.array(intensity_matrix, dtype=float)
+    if reference == "mean":
+        dynamic -= np.nanmean(dynamic, axis=0)
+    elif reference == "first":
+        dynamic -= dynamic[0]
+    elif reference == "last":
+        dynamic -= dynamic[-1]
+    return np.nan_to_num(dynamic, copy=False, nan=0.0)
+
+
+def hilbert_noda(n):
+    """The (n x n) Hilbert-Noda matrix: 0 on the diagonal, 1 / (pi (k - j)) elsewhere."""
+    offsets = np.arange(n)[None, :] - np.arange(n)[:, None]
+    with np.errstate(divide="ignore"):
+        matrix = 1 / (np.pi * offsets)
+    matrix[offsets == 0] = 0.0
+    return matrix
+
+
+def hilbert_noda_transform(dynamic):
+    """``hilbert_noda(len(dynamic)) @ dynamic`` as a convolution along the rows, by FFT."""
+    n = len(dynamic)
+    lags = np.arange(-(n - 1), n)
+    with np.errstate(divide="ignore"):
+        kernel = -1 / (np.pi * lags)
+    kernel[n - 1] = 0.0
+    return fftconvolve(dynamic, kernel[:, None], axes=0)[n - 1:2 * n - 1]
+
+
+def even_perturbation(perturbation, intensity_matrix, n_points=None):
+    """Resample the spectra onto evenly spaced perturbation values.
+
+    2D-COS assumes equal steps of the perturbation. ``perturbation`` (one
+    value per spectrum, e.g. time or potential) should be monotonic over the
+    selected range; spectra are sorted by it (ascending, so a falling
+    potential is reversed), repeated values are dropped and so are spectra
+    without a value (NaN, e.g. outside the potential record).
+    Returns ``(values, intensity_matrix)``.
+    """
+    perturbation = np.asarray(perturbation, dtype=float)
+    finite = np.flatnonzero(np.isfinite(perturbation))
+    if len(finite) < 2:
+        raise ValueError(f"2D-COS needs at least 2 spectra with a finite perturbation value, got {len(finite)}")
+    values, first = np.unique(perturbation[finite], return_index=True)
+    first = finite[first]
+    axis = np.linspace(values[0], values[-1], n_points or len(values))
+    return axis, resample_times(values, np.asarray(intensity_matrix)[first], axis)
+
+
+def correlation_maps(intensity_matrix, reference="mean", block_size=256):
+    """Synchronous and asynchronous correlation maps ``(shifts x shifts)`` of a grid.
+
+    The rows of ``intensity_matrix`` must be equally spaced in the
+    perturbation (see ``even_perturbation``). Besides the two maps and the
+    dynamic spectra, only one (spectra x ``block_size``) Hilbert-Noda block
+    is held at a time.
+    """
+    dynamic = dynamic_spectra(intensity_matrix, reference)
+    n_spectra, n_shifts = dynamic.shape
+    scale = 1 / max(n_spectra - 1, 1)
+    synchronous = np.empty((n_shifts, n_shifts))
+    asynchronous = np.empty((n_shifts, n_shifts))
+    starts = range(0, n_shifts, block_size)
+    for col_start in starts:
+        cols = slice(col_start, min(col_start + block_size, n_shifts))
+        transformed = hilbert_noda_transform(dynamic[:, cols])
+        for row_start in starts:
+            if row_start > col_start:
+                break
+            rows = slice(row_start, min(row_start + block_size, n_shifts))
+            # Synchronous is symmetric and asynchronous antisymmetric, the
+            # block below the diagonal is the transpose of this one
+            synchronous[rows, cols] = scale * (dynamic[:, rows].T @ dynamic[:, cols])
+            asynchronous[rows, cols] = scale * (dynamic[:, rows].T @ transformed)
+            if row_start != col_start:
+                synchronous[cols, rows] = synchronous[rows, cols].T
+                asynchronous[cols, rows] = -asynchronous[rows, cols].T
+    return synchronous, asynchronous
+
+
+def _nearest(unique_shifts, shift):
+    return int(np.argmin(np.abs(np.asarray(unique_shifts) - shift)))
+
+
+def band_order(unique_shifts, synchronous, asynchronous, first, second):
+    """Noda's rule at (``first``, ``second``) cm⁻¹.
+
+    Returns 1 when the band at ``first`` changes before the one at ``second``,
+    -1 when after, 0 when the asynchronous map gives no order.
+    """
+    i, j = _nearest(unique_shifts, first), _nearest(unique_shifts, second)
+    return int(np.sign(synchronous[i, j]) * np.sign(asynchronous[i, j]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="2D correlation maps of an operando Raman export.")
+    parser.add_argument("file", help="Time/Ramanshift/Intensity export")
+    parser.add_argument("--window", nargs=2, type=float, default=(1200, 1700), metavar=("LOW", "HIGH"),
+                        help="Raman shift window in cm⁻¹")
+    parser.add_argument("--time-range", nargs=2, type=float, metavar=("START", "END"),
+                        help="time window in hours, e.g. one discharge")
+    parser.add_argument("--time-unit", type=float, default=3600, help="divisor of the Time column")
+    parser.add_argument("--potential", help="potential export; use the potential as the perturbation")
+    parser.add_argument("--reference", choices=REFERENCE_MODES, default="mean")
+    parser.add_argument("--bands", nargs=2, type=float, default=(1320, 1600), metavar=("BAND1", "BAND2"),
+                        help="report which of these two bands changes first")
+    parser.add_argument("--render", choices=RENDER_MODES, default="contour")
+    parser.add_argument("--block-size", type=int, default=256, help="shift columns per block")
+    parser.add_argument("--out", help="save the figure here instead of showing it")
+    args = parser.parse_args(argv)
+
+    unique_times, unique_shifts, intensity_matrix = processed_grid(
+        args.file, shift_window=args.window, time_range=args.time_range, time_unit=args.time_unit,
+        normalize="max", despike=True
+    )
+    perturbation, label = unique_times, "time"
+    if args.potential:
+        potential_times, potential = load_potential(args.potential)
+        perturbation, label = potential_at(unique_times, potential_times, potential, mode="interp"), "potential"
+        outside = np.count_nonzero(~np.isfinite(perturbation))
+        if outside:
+            print(f"{outside} spectra outside the potential record are left out", file=sys.stderr)
+    _, intensity_matrix = even_perturbation(perturbation, intensity_matrix)
+    synchronous, asynchronous = correlation_maps(intensity_matrix, args.reference, args.block_size)
+
+    first, second = args.bands
+    order = band_order(unique_shifts, synchronous, asynchronous, first, second)
+    when = {1: "before", -1: "after"}.get(order)
+    # The spectra are ordered by increasing perturbation: for a falling
+    # potential (a discharge) that is backwards in time
+    finite = perturbation[np.isfinite(perturbation)]
+    note = f"in increasing {label}"
+    if label == "potential" and finite[-1] < finite[0]:
+        note += ", the potential falls here so in time the order is the reverse"
+    print(f"{first:g} cm⁻¹ changes {when} {second:g} cm⁻¹ ({note})" if when
+          else f"no order between {first:g} and {second:g} cm⁻¹")
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    plot_correlation_map(ax1, unique_shifts, synchronous, title="Synchronous", render=args.render)
+    plot_correlation_map(ax2, unique_shifts, asynchronous, title="Asynchronous", render=args.render)
+    fig.tight_layout()
+    if args.out:
+        fig.savefig(args.out, dpi=150)
+    else:
+        plt.show()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
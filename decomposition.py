@@ -0,0 +1,236 @@
+import numpy as np
+
+# Component analysis of (time x shift) intensity grids: randomized PCA,
+# NMF and MCR-ALS give a few spectral loadings and their time-resolved scores.
+#
+#     scores, loadings, mean, explained = pca(intensity_matrix, 3)
+#     concentrations, spectra, lack_of_fit = mcr_als(intensity_matrix, 3)
+#
+# Everything walks over blocks of ``block_rows`` spectra, so memory stays at
+# a few (spectra x components) and (components x shifts) arrays plus one
+# block: no covariance matrix, no centered copy of the grid. Missing (NaN)
+# cells count as the mean spectrum in PCA and as zero in NMF / MCR-ALS.
+
+DEFAULT_BLOCK_ROWS = 4096
+
+
+def _blocks(n_rows, block_rows):
+    for start in range(0, n_rows, block_rows):
+        yield slice(start, min(start + block_rows, n_rows))
+
+
+def _rows(intensity_matrix, rows, mean=None, nonnegative=False):
+    # One block as float64, centered on ``mean`` with NaN cells at zero
+    block = np.array(intensity_matrix[rows], dtype=float)
+    if mean is not None:
+        block -= mean
+    np.nan_to_num(block, copy=False, nan=0.0)
+    if nonnegative:
+        np.maximum(block, 0.0, out=block)
+    return block
+
+
+def column_mean(intensity_matrix, block_rows=DEFAULT_BLOCK_ROWS):
+    """Mean spectrum, ignoring missing cells."""
+    total = np.zeros(intensity_matrix.shape[1])
+    count = np.zeros(intensity_matrix.shape[1])
+    for rows in _blocks(len(intensity_matrix), block_rows):
+        block = np.asarray(intensity_matrix[rows], dtype=float)
+        total += np.nansum(block, axis=0)
+        count += np.sum(~np.isnan(block), axis=0)
+    return total / np.maximum(count, 1)
+
+
+def randomized_svd(intensity_matrix, rank, mean=None, n_oversamples=10, n_iter=4,
+                   block_rows=DEFAULT_BLOCK_ROWS, seed=0):
+    """Truncated SVD ``U, s, Vt`` of the grid (minus ``mean``) by random projection.
+
+    Halko, Martinsson & Tropp: a Gaussian sketch of rank + ``n_oversamples``
+    columns, ``n_iter`` power iterations to sharpen it, then an exact SVD of
+    the small projected matrix. Only products with row blocks are formed.
+    """
+    n_rows, n_cols = intensity_matrix.shape
+    sketch = min(rank + n_oversamples, n_rows, n_cols)
+    rng = np.random.default_rng(seed)
+
+    def times_right(right):
+        out = np.empty((n_rows, right.shape[1]))
+        for rows in _blocks(n_rows, block_rows):
+            out[rows] = _rows(intensity_matrix, rows, mean) @ right
+        return out
+
+    def times_left(left):
+        out = np.zeros((n_cols, left.shape[1]))
+        for rows in _blocks(n_rows, block_rows):
+            out += _rows(intensity_matrix, rows, mean).T @ left[rows]
+        return out
+
+    basis, _ = np.linalg.qr(times_right(rng.standard_normal((n_cols, sketch))))
+    for _ in range(n_iter):
+        right, _ = np.linalg.qr(times_left(basis))
+        basis, _ = np.linalg.qr(times_right(right))
+
+    projected = times_left(basis).T
+    u_small, s, vt = np.linalg.svd(projected, full_matrices=False)
+    return (basis @ u_small)[:, :rank], s[:rank], vt[:rank]
+
+
+def pca(intensity_matrix, n_components=3, block_rows=DEFAULT_BLOCK_ROWS, seed=0, **svd_options):
+    """Principal components of the spectra.
+
+    Returns ``(scores, loadings, mean, explained)``: scores (spectra x
+    components) over time, loadings (components x shifts), the mean
+    spectrum and the fraction of the total variance of each component.
+    """
+    mean = column_mean(intensity_matrix, block_rows)
+    u, s, vt = randomized_svd(intensity_matrix, n_components, mean, block_rows=block_rows,
+                              seed=seed, **svd_options)
+    total = sum(np.sum(_rows(intensity_matrix, rows, mean) ** 2)
+                for rows in _blocks(len(intensity_matrix), block_rows))
+    explained = s ** 2 / total if total else np.zeros_like(s)
+    return u * s, vt, mean, explained
+
+
+def _plan(intensity_matrix, block_rows, nonnegative=False):
+    """Row blocks with a flag for those usable as they are, and the squared norm of the grid.
+
+    A block is clean when it is float64 without NaN (and, with
+    ``nonnegative``, without negative values); the iterations then use it
+    without a copy.
+    """
+    plan = []
+    total = 0.0
+    for rows in _blocks(len(intensity_matrix), block_rows):
+        block = np.asarray(intensity_matrix[rows])
+        clean = block.dtype == np.float64 and not np.isnan(block).any()
+        if nonnegative:
+            clean = clean and not (block < 0).any()
+        if not clean:
+            block = _rows(intensity_matrix, rows, nonnegative=nonnegative)
+        plan.append((rows, clean))
+        total += np.einsum("ij,ij->", block, block)
+    return plan, total
+
+
+def _block(intensity_matrix, rows, clean, nonnegative=False):
+    if clean:
+        return intensity_matrix[rows]
+    return _rows(intensity_matrix, rows, nonnegative=nonnegative)
+
+
+def nndsvd(intensity_matrix, n_components=3, block_rows=DEFAULT_BLOCK_ROWS, seed=0):
+    """Non-negative starting point ``(W, H)`` from a truncated SVD (Boutsidis & Gallopoulos).
+
+    Each singular pair keeps its positive or its negative part, whichever
+    carries more of it; zeros are set to the mean so that multiplicative
+    updates can still move them.
+    """
+    u, s, vt = randomized_svd(intensity_matrix, n_components, block_rows=block_rows, seed=seed)
+    weights = np.empty_like(u)
+    components = np.empty_like(vt)
+    for k in range(len(s)):
+        pos_u, neg_u = np.maximum(u[:, k], 0), np.maximum(-u[:, k], 0)
+        pos_v, neg_v = np.maximum(vt[k], 0), np.maximum(-vt[k], 0)
+        pos = np.linalg.norm(pos_u) * np.linalg.norm(pos_v)
+        neg = np.linalg.norm(neg_u) * np.linalg.norm(neg_v)
+        left, right, size = (pos_u, pos_v, pos) if pos >= neg else (neg_u, neg_v, neg)
+        scale = np.sqrt(s[k] * size) if size else 0.0
+        weights[:, k] = scale * left / max(np.linalg.norm(left), np.finfo(float).tiny)
+        components[k] = scale * right / max(np.linalg.norm(right), np.finfo(float).tiny)
+    mean = max(weights.mean(), components.mean(), np.finfo(float).eps)
+    weights[weights <= 0] = mean
+    components[components <= 0] = mean
+    return weights, components
+
+
+def nmf(intensity_matrix, n_components=3, n_iter=200, tol=1e-5, block_rows=DEFAULT_BLOCK_ROWS, seed=0):
+    """Non-negative factorization ``W @ H`` by multiplicative updates (Lee & Seung).
+
+    Negative intensities are clipped to zero. Returns ``(W, H)``: time
+    profiles (spectra x components) and component spectra (components x
+    shifts), started from ``nndsvd``. Every iteration is one pass over the
+    grid; it stops when the fit error changes by less than ``tol`` (relative).
+    """
+    plan, total = _plan(intensity_matrix, block_rows, nonnegative=True)
+    weights, components = nndsvd(intensity_matrix, n_components, block_rows, seed)
+    eps = np.finfo(float).eps
+
+    previous = np.inf
+    for _ in range(n_iter):
+        # W update block by block with the current H; the same pass gathers
+        # W^T A for the H update and tr(W^T A H^T) for the error
+        hht = components @ components.T
+        wt_a = np.zeros_like(components)
+        cross = 0.0
+        for rows, clean in plan:
+            block = _block(intensity_matrix, rows, clean, nonnegative=True)
+            a_ht = block @ components.T
+            weights[rows] *= a_ht / (weights[rows] @ hht + eps)
+            wt_a += weights[rows].T @ block
+            cross += np.sum(weights[rows] * a_ht)
+        wtw = weights.T @ weights
+        error = total - 2 * cross + np.sum(wtw * hht)
+        components *= wt_a / (wtw @ components + eps)
+        if abs(previous - error) <= tol * max(total, eps):
+            break
+        previous = error
+    return weights, components
+
+
+def mcr_als(intensity_matrix, n_components=3, initial_spectra=None, n_iter=100, tol=1e-6,
+            block_rows=DEFAULT_BLOCK_ROWS, seed=0):
+    """Multivariate curve resolution by alternating least squares, non-negative.
+
+    The grid is modelled as concentrations (spectra x components) times pure
+    component spectra (components x shifts), both clipped to be non-negative,
+    each spectrum scaled to a maximum of 1. ``initial_spectra`` (e.g. known
+    reference spectra on the same shift axis) defaults to ``nndsvd``.
+    Returns ``(concentrations, spectra, lack_of_fit)``, the last in percent.
+    """
+    plan, total = _plan(intensity_matrix, block_rows)
+    if initial_spectra is None:
+        _, spectra = nndsvd(intensity_matrix, n_components, block_rows, seed)
+    else:
+        spectra = np.array(initial_spectra, dtype=float)
+    tiny = np.finfo(float).tiny
+    spectra /= np.maximum(spectra.max(axis=1, keepdims=True), tiny)
+
+    concentrations = np.zeros((len(intensity_matrix), len(spectra)))
+    previous = np.inf
+    lack_of_fit = 100.0
+    for _ in range(n_iter):
+        # C = A S^T (S S^T)^-1 block by block, gathering C^T A for
+        # S = (C^T C)^-1 C^T A in the same pass
+        projector = np.linalg.pinv(spectra)
+        ct_a = np.zeros_like(spectra)
+        for rows, clean in plan:
+            block = _block(intensity_matrix, rows, clean)
+            concentrations[rows] = np.maximum(block @ projector, 0.0)
+            ct_a += concentrations[rows].T @ block
+        ctc = concentrations.T @ concentrations
+        spectra = np.maximum(np.linalg.pinv(ctc) @ ct_a, 0.0)
+
+        # |A - C S|^2 from the small products, without another pass
+        residual = max(total - 2 * np.sum(ct_a * spectra) + np.sum(ctc * (spectra @ spectra.T)), 0.0)
+        lack_of_fit = 100 * np.sqrt(residual / total) if total else 0.0
+        peaks = np.maximum(spectra.max(axis=1, keepdims=True), tiny)
+        spectra /= peaks
+        concentrations *= peaks.T
+        if abs(previous - residual) <= tol * max(total, np.finfo(float).eps):
+            break
+        previous = residual
+    return concentrations, spectra, lack_of_fit
+
+
+def low_rank_denoise(intensity_matrix, rank=3, block_rows=DEFAULT_BLOCK_ROWS, seed=0):
+    """Replace the grid in place by its rank-``rank`` PCA reconstruction and return it.
+
+    Keeps the structure shared by many spectra and drops the noise, e.g.
+    before ``contourf``. Missing cells stay missing. Needs a writable float grid.
+    """
+    scores, loadings, mean, _ = pca(intensity_matrix, rank, block_rows=block_rows, seed=seed)
+    for rows in _blocks(len(intensity_matrix), block_rows):
+        missing = np.isnan(intensity_matrix[rows])
+        intensity_matrix[rows] = scores[rows] @ loadings + mean
+        intensity_matrix[rows][missing] = np.nan
+    return intensity_matrix
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from normalization import normalize_grid, remove_spikes
+from profiling import profile_stage
+from raman_grid import resample_spectra
+from raman_io import CACHE_DIR_NAME, load_table, source_digest, stream_to_grid
+
+# On-disk memo of processed grids. A grid is stored under a key made of the
+# source file's content hash and every processing parameter, so re-rendering
+# a figure after a cosmetic change (colormap, title ...) skips the numeric work.
+# The grids live in .raman_cache/grids next to the source file.
+
+# Bump when the processing itself changes so old entries are not reused
+GRID_CACHE_VERSION = 2
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def grid_cache_dir(file_path):
+    """Default grid cache of ``file_path``: ``CACHE_DIR_NAME/grids`` next to the file.
+
+    Like the ``.npy`` cache of ``raman_io``, so an export has one cache
+    whatever folder the scripts run from.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME, "grids")
+
+
+def grid_key(file_path, **params):
+    """Content-addressed key for a processed grid of ``file_path``."""
+    payload = json.dumps(
+        {"source": source_digest(file_path), "version": GRID_CACHE_VERSION, "params": params},
+        sort_keys=True, default=list,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class GridCache:
+    """Directory of ``.npz`` grids with least-recently-used eviction.
+
+    Every hit refreshes the entry's mtime; after each ``put`` the oldest
+    entries are removed until the directory is below ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def get(self, key):
+        """Return ``(unique_times, unique_shifts, intensity_matrix)`` or None."""
+        path = self.path(key)
+        try:
+            with np.load(path) as stored:
+                grid = stored["unique_times"], stored["unique_shifts"], stored["intensity_matrix"]
+        except (OSError, KeyError, ValueError):
+            return None
+        os.utime(path)
+        return grid
+
+    def put(self, key, unique_times, unique_shifts, intensity_matrix):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, unique_times=unique_times, unique_shifts=unique_shifts,
+                 intensity_matrix=intensity_matrix)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        """``(mtime, size, path)`` for every stored grid, oldest first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz") and not name.endswith(".tmp.npz"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(self.cache_dir, name)))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+
+def build_grid(file_path, shift_window=None, time_range=None, time_unit=3600,
+               normalize=None, resample_step=None, normalize_band=None, despike=False, profiler=None):
+    """Run load -> time filter -> shift window -> grid -> despike -> normalize without caching.
+
+    resample_step -- None pivots on the exact shift values; a number (an
+                     evenly spaced axis) or "auto" (the first spectrum's
+                     shifts) interpolates every spectrum onto a common axis
+                     with ``resample_spectra``
+    normalize     -- None or a ``normalization.NORMALIZE_MODES`` mode, e.g. "max"
+                     (divide by the global maximum) or "band" with
+                     ``normalize_band=(low, high)``
+    despike       -- replace cosmic-ray spikes first (``normalization.remove_spikes``)
+    profiler      -- optional ``profiling.StageProfiler`` that times every stage
+    """
+    if resample_step is None:
+        with profile_stage(profiler, "stream_grid"):
+            unique_times, unique_shifts, intensity_matrix = stream_to_grid(
+                file_path, shift_range=shift_window, time_range=time_range, time_unit=time_unit
+            )
+    else:
+        with profile_stage(profiler, "load_table"):
+            data = load_table(file_path)
+        with profile_stage(profiler, "filter"):
+            time = data[:, 0] / time_unit
+            keep = np.ones(len(time), dtype=bool)
+            if time_range is not None:
+                keep &= (time >= time_range[0]) & (time <= time_range[1])
+        with profile_stage(profiler, "resample"):
+            unique_times, unique_shifts, intensity_matrix = resample_spectra(
+                time[keep], data[keep, 1], data[keep, 2],
+                step=None if resample_step == "auto" else resample_step, shift_range=shift_window,
+            )
+
+    if despike:
+        with profile_stage(profiler, "despike"):
+            remove_spikes(intensity_matrix)
+    if normalize is not None:
+        with profile_stage(profiler, "normalize"):
+            normalize_grid(intensity_matrix, normalize, unique_shifts, band=normalize_band)
+    return unique_times, unique_shifts, intensity_matrix
+
+
+def processed_grid(file_path, shift_window=None, time_range=None, time_unit=3600,
+                   normalize=None, resample_step=None, normalize_band=None, despike=False, cache=None,
+                   profiler=None):
+    """Memoized ``build_grid``: returns the stored grid when the source and
+    every parameter are unchanged, otherwise builds and stores it.
+
+    ``cache`` defaults to the ``GridCache`` in ``grid_cache_dir(file_path)``;
+    pass ``cache=False`` to bypass the memo. ``profiler`` times the memo
+    lookup and, on a miss, the stages of ``build_grid``.
+    """
+    params = dict(shift_window=shift_window, time_range=time_range, time_unit=time_unit,
+                  normalize=normalize, resample_step=resample_step)
+    if normalize_band is not None or despike:
+        # Only in the key when used, so existing entries stay valid
+        params.update(normalize_band=normalize_band, despike=despike)
+    if cache is False:
+        return build_grid(file_path, profiler=profiler, **params)
+    if cache is None:
+        cache = GridCache(grid_cache_dir(file_path))
+
+    with profile_stage(profiler, "grid_cache"):
+        key = grid_key(file_path, **params)
+        grid = cache.get(key)
+    if grid is None:
+        grid = build_grid(file_path, profiler=profiler, **params)
+        with profile_stage(profiler, "cache_store"):
+            cache.put(key, *grid)
+    return grid
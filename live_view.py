@@ -0,0 +1,232 @@
+"""Follow an export that is still being recorded and keep its maps up to date.
+
+Example (the spot-particle cell, two windows, refreshed every 5 s):
+
+    python live_view.py ECEDEC-10-10s-spotparticle-cell5-1sep_Copy.txt \
+        --window 1000 1750 --window 150 300 --interval 5
+
+Every refresh reads only the bytes appended since the previous one
+(``raman_io.TailReader``), adds the new spectra to a growing grid
+(``raman_grid.GrowingGrid``), re-reduces only the screen bins those spectra
+fall in (``RunningRaster``) and redraws the maps in the same figure, so the
+cost of a refresh follows the new data and not the size of the file.
+"""
+import argparse
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from raman_grid import GrowingGrid, _bin_edges
+from raman_io import TailReader
+from raman_plots import RENDER_MODES, axis_pixels, draw_raster
+
+
+class RunningRaster:
+    """Screen-sized means of a ``GrowingGrid``, kept up to date bin by bin.
+
+    Time is cut into ``n_rows`` bins of equal width from ``start`` and the
+    shift axis into at most ``n_cols`` groups of columns. ``update`` re-reduces
+    only the time bins that hold the given times, so its cost follows the new
+    spectra and not the length of the run. When a spectrum lands past the last
+    bin, neighbouring bins are merged and the width doubles (O(bins)). With a
+    ``span`` the bins are fixed and later spectra are left out.
+    """
+
+    def __init__(self, n_rows, n_cols, start=0.0, span=None):
+        self.n_rows = max(n_rows + n_rows % 2, 2)
+        self.n_cols = max(n_cols, 1)
+        self.start = start
+        self.fixed = span is not None
+        self.width = span / self.n_rows if span else None
+        self.clear()
+
+    def clear(self):
+        self.unique_shifts = None
+        self.used = 0
+        self.sums = np.zeros((self.n_rows, 0))
+        self.counts = np.zeros((self.n_rows, 0))
+        if not self.fixed:
+            self.width = None
+
+    def _set_columns(self, unique_shifts):
+        self.unique_shifts = unique_shifts
+        self.col_starts = _bin_edges(len(unique_shifts), self.n_cols)
+        sizes = np.diff(np.append(self.col_starts, len(unique_shifts)))
+        self.col_centers = np.add.reduceat(unique_shifts, self.col_starts) / sizes
+        self.sums = np.zeros((self.n_rows, len(self.col_starts)))
+        self.counts = np.zeros((self.n_rows, len(self.col_starts)))
+        self.used = 0
+
+    def _merge(self):
+        half = self.n_rows // 2
+        for values in (self.sums, self.counts):
+            values[:half] = values[0::2] + values[1::2]
+            values[half:] = 0
+        self.width *= 2
+        self.used = (self.used + 1) // 2
+
+    def update(self, grid, times):
+        """Re-reduce the bins holding ``times`` (hours) from ``grid``; False if nothing is in view."""
+        unique_times = grid.unique_times
+        if len(unique_times) == 0:
+            return False
+        if self.unique_shifts is None or not np.array_equal(self.unique_shifts, grid.unique_shifts):
+            # New shift columns: start over from the whole grid (rare, a new axis)
+            self._set_columns(grid.unique_shifts)
+            times = unique_times
+        times = np.unique(times)
+        times = times[times >= self.start]
+        if len(times) == 0:
+            return self.used > 0
+        if self.width is None:
+            # First spectra fill about half of the bins
+            self.width = max(2 * (times[-1] - self.start) / self.n_rows, 1e-6)
+        if self.fixed:
+            times = times[times < self.start + self.width * self.n_rows]
+        else:
+            while times[-1] >= self.start + self.width * self.n_rows:
+                self._merge()
+
+        bins = np.unique(((times - self.start) // self.width).astype(int))
+        for b in bins:
+            low = np.searchsorted(unique_times, self.start + b * self.width)
+            high = np.searchsorted(unique_times, self.start + (b + 1) * self.width)
+            block = grid.intensity_matrix[low:high]
+            filled = ~np.isnan(block)
+            self.sums[b] = np.add.reduceat(np.where(filled, block, 0.0).sum(axis=0), self.col_starts)
+            self.counts[b] = np.add.reduceat(filled.sum(axis=0), self.col_starts)
+        if len(bins):
+            self.used = max(self.used, bins[-1] + 1)
+        return self.used > 0
+
+    def image(self):
+        """``(time_centers, shift_centers, means)`` of the bins used so far; empty bins are NaN."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = self.sums[:self.used] / self.counts[:self.used]
+        time_centers = self.start + (np.arange(self.used) + 0.5) * self.width
+        return time_centers, self.col_centers, means
+
+
+class LiveMap:
+    """One contour map of a shift window, redrawn in place as spectra arrive.
+
+    The map is drawn from a ``RunningRaster`` of the axes' pixel size, so a
+    refresh reduces only the new spectra and draws a screen-sized image
+    (or contours of it), however long the run.
+    """
+
+    def __init__(self, ax, shift_range, time_unit=3600, render="raster", levels=100, cmap="plasma",
+                 time_limits=None):
+        if render not in RENDER_MODES:
+            raise ValueError(f"render must be one of {RENDER_MODES}, got {render!r}")
+        self.ax = ax
+        self.grid = GrowingGrid(shift_range, time_unit)
+        self.render = render
+        self.levels = levels
+        self.cmap = cmap
+        self.time_limits = time_limits
+        self.artist = None
+        self.colorbar = None
+        width, height = axis_pixels(ax)
+        start, span = (time_limits[0], time_limits[1] - time_limits[0]) if time_limits else (0.0, None)
+        self.raster = RunningRaster(height, width, start, span)
+        self._new_times = []
+
+        ax.set_xlabel("Raman Shift (cm⁻¹)")
+        ax.set_ylabel("Time (hours)")
+        ax.set_title(f"Operando Raman Contour Map ({shift_range[0]:g}-{shift_range[1]:g} cm⁻¹)")
+
+    def clear(self):
+        self.grid.clear()
+        self.raster.clear()
+        self._new_times = []
+
+    def append(self, rows):
+        """Add long-format rows; returns the number of spectra that changed."""
+        if len(rows) == 0:
+            return 0
+        changed = self.grid.append(rows[:, 0], rows[:, 1], rows[:, 2])
+        if changed:
+            self._new_times.append(rows[:, 0] / self.grid.time_unit)
+        return changed
+
+    def redraw(self):
+        times = np.concatenate(self._new_times) if self._new_times else np.empty(0)
+        self._new_times = []
+        if not self.raster.update(self.grid, times):
+            return
+        time_centers, shift_centers, means = self.raster.image()
+        if self.artist is not None:
+            self.artist.remove()
+        # contourf needs two rows, a single one is shown as a raster
+        if self.render == "contour" and len(time_centers) > 1:
+            self.artist = self.ax.contourf(shift_centers, time_centers, means, levels=self.levels, cmap=self.cmap)
+        else:
+            self.artist = draw_raster(self.ax, shift_centers, time_centers, means, cmap=self.cmap, downsample=False)
+
+        if self.colorbar is None:
+            self.colorbar = self.ax.figure.colorbar(self.artist, ax=self.ax)
+            self.colorbar.set_label("Intensity (a.u.)")
+        else:
+            self.colorbar.update_normal(self.artist)
+        unique_shifts = self.grid.unique_shifts
+        self.ax.set_xlim(unique_shifts[0], unique_shifts[-1])
+        # From the start of the run to the latest spectrum unless limits are
+        # given, time running downwards like in the saved figures
+        low, high = self.time_limits or (0, self.grid.unique_times[-1])
+        if high > low:
+            self.ax.set_ylim(high, low)
+
+
+def watch(file_path, windows, interval=2.0, time_unit=3600, render="raster", levels=100, cmap="plasma",
+          time_limits=None, max_refreshes=None):
+    """Show one live map per shift window until the figure is closed.
+
+    ``time_limits`` fixes the time axis (default: 0 to the latest spectrum);
+    ``max_refreshes`` stops after that many polls (None: until closed).
+    Returns the ``LiveMap`` objects.
+    """
+    reader = TailReader(file_path)
+    fig, axes = plt.subplots(1, len(windows), figsize=(9 * len(windows), 6), squeeze=False)
+    maps = [LiveMap(ax, window, time_unit, render, levels, cmap, time_limits)
+            for ax, window in zip(axes[0], windows)]
+    restarts = reader.restarts
+    refreshes = 0
+
+    while plt.fignum_exists(fig.number):
+        rows = reader.read_new()
+        if reader.restarts != restarts:
+            restarts = reader.restarts
+            for live_map in maps:
+                live_map.clear()
+        changed = [live_map for live_map in maps if live_map.append(rows)]
+        for live_map in changed:
+            live_map.redraw()
+        if changed:
+            fig.canvas.draw_idle()
+
+        refreshes += 1
+        if max_refreshes is not None and refreshes >= max_refreshes:
+            break
+        plt.pause(interval)
+    return maps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Live operando Raman maps of a growing export.")
+    parser.add_argument("file_path")
+    parser.add_argument("--window", nargs=2, type=float, action="append", metavar=("LOW", "HIGH"),
+                        help="Raman shift window in cm⁻¹, can be repeated (default: 1000 1750)")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between refreshes")
+    parser.add_argument("--time-range", nargs=2, type=float, metavar=("START", "END"),
+                        help="fixed time axis (default: 0 to the latest spectrum)")
+    parser.add_argument("--time-unit", type=float, default=3600, help="divisor of the Time column")
+    parser.add_argument("--render", choices=RENDER_MODES, default="raster",
+                        help="raster keeps refreshes cheap for long runs, contour matches the scripts")
+    args = parser.parse_args(argv)
+    watch(args.file_path, args.window or [(1000, 1750)], args.interval, args.time_unit, args.render,
+          time_limits=args.time_range)
+
+
+if __name__ == "__main__":
+    main()
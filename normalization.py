@@ -0,0 +1,113 @@
+import numpy as np
+from scipy.ndimage import maximum_filter1d, median_filter
+
+# Normalization of (time x shift) intensity matrices. Everything works in
+# place on the float matrix it is given (and returns it), so a grid fresh
+# from raman_grid / grid_cache can be normalized without another full copy.
+
+NORMALIZE_MODES = ("max", "spectrum_max", "area", "band", "minmax", "zscore")
+
+
+def _float_matrix(intensity_matrix):
+    if not (isinstance(intensity_matrix, np.ndarray) and intensity_matrix.dtype.kind == "f"):
+        raise TypeError("normalization works in place and needs a float numpy array")
+    return intensity_matrix
+
+
+def _safe_divide(intensity_matrix, scale):
+    # Rows (or grids) with a zero / NaN scale are left as they are
+    scale = np.where(np.isfinite(scale) & (scale != 0), scale, 1.0)
+    intensity_matrix /= scale
+    return intensity_matrix
+
+
+def trapezoid_weights(unique_shifts):
+    """Weights ``w`` such that ``intensity_matrix @ w`` is the trapezoid area of every spectrum."""
+    steps = np.abs(np.diff(np.asarray(unique_shifts, dtype=float)))
+    weights = np.zeros(len(steps) + 1)
+    weights[:-1] += steps / 2
+    weights[1:] += steps / 2
+    return weights
+
+
+def spectrum_areas(unique_shifts, intensity_matrix):
+    """Trapezoid area under every spectrum (row); missing cells count as zero."""
+    weights = trapezoid_weights(unique_shifts)
+    if np.isnan(intensity_matrix).any():
+        return np.nansum(intensity_matrix * weights, axis=1)
+    return intensity_matrix @ weights
+
+
+def normalize_grid(intensity_matrix, mode="max", unique_shifts=None, band=None):
+    """Normalize a (time x shift) matrix in place and return it.
+
+    max          -- divide by the global maximum (the old scripts' behaviour)
+    spectrum_max -- divide every spectrum by its own maximum
+    area         -- divide every spectrum by its area (needs ``unique_shifts``)
+    band         -- divide every spectrum by its maximum inside the reference
+                    ``band`` = (low, high) in cm⁻¹, e.g. the G band (needs
+                    ``unique_shifts``)
+    minmax       -- scale every spectrum to 0..1
+    zscore       -- zero mean and unit standard deviation per spectrum
+
+    NaN cells stay NaN and are ignored by the statistics.
+    """
+    intensity_matrix = _float_matrix(intensity_matrix)
+    if intensity_matrix.size == 0:
+        return intensity_matrix
+    if mode == "max":
+        return _safe_divide(intensity_matrix, np.nanmax(intensity_matrix))
+    if mode == "spectrum_max":
+        return _safe_divide(intensity_matrix, np.nanmax(intensity_matrix, axis=1, keepdims=True))
+    if mode in ("area", "band"):
+        if unique_shifts is None:
+            raise ValueError(f"{mode!r} normalization needs unique_shifts")
+        unique_shifts = np.asarray(unique_shifts, dtype=float)
+        if mode == "area":
+            return _safe_divide(intensity_matrix, spectrum_areas(unique_shifts, intensity_matrix)[:, None])
+        if band is None:
+            raise ValueError("'band' normalization needs band=(low, high)")
+        columns = np.flatnonzero((unique_shifts >= band[0]) & (unique_shifts <= band[1]))
+        if len(columns) == 0:
+            raise ValueError(f"no shifts inside the reference band {band}")
+        reference = np.nanmax(intensity_matrix[:, columns[0]:columns[-1] + 1], axis=1, keepdims=True)
+        return _safe_divide(intensity_matrix, reference)
+    if mode == "minmax":
+        low = np.nanmin(intensity_matrix, axis=1, keepdims=True)
+        high = np.nanmax(intensity_matrix, axis=1, keepdims=True)
+        intensity_matrix -= low
+        return _safe_divide(intensity_matrix, high - low)
+    if mode == "zscore":
+        intensity_matrix -= np.nanmean(intensity_matrix, axis=1, keepdims=True)
+        return _safe_divide(intensity_matrix, np.nanstd(intensity_matrix, axis=1, keepdims=True))
+    raise ValueError(f"mode must be one of {NORMALIZE_MODES}, got {mode!r}")
+
+
+def remove_spikes(intensity_matrix, size=5, threshold=10.0):
+    """Replace cosmic-ray spikes in place and return the boolean spike mask.
+
+    Every spectrum is compared with its running median over ``size`` points
+    along the shift axis; cells that stand out above it by more than
+    ``threshold`` robust standard deviations (1.4826 x median absolute
+    deviation of that spectrum) are set to the median. A cosmic ray hits a
+    single spectrum, so outliers that also show up at the same shift in the
+    previous or next spectrum are kept as real narrow bands. Only upward
+    outliers are treated, and cells next to missing values are left as they are.
+    """
+    intensity_matrix = _float_matrix(intensity_matrix)
+    if intensity_matrix.shape[-1] < 3:
+        return np.zeros(intensity_matrix.shape, dtype=bool)
+    median = median_filter(intensity_matrix, size=(1, size), mode="nearest")
+    residual = intensity_matrix - median
+    with np.errstate(invalid="ignore"):
+        scale = 1.4826 * np.nanmedian(np.abs(residual), axis=1, keepdims=True)
+        spikes = residual > threshold * np.maximum(scale, np.finfo(float).tiny)
+    repeated = np.zeros_like(spikes)
+    repeated[1:] |= spikes[:-1]
+    repeated[:-1] |= spikes[1:]
+    spikes &= ~repeated
+    missing = np.isnan(intensity_matrix)
+    if missing.any():
+        spikes &= ~maximum_filter1d(missing.view(np.uint8), size, axis=1, mode="nearest").astype(bool)
+    intensity_matrix[spikes] = median[spikes]
+    return spikes
@@ -0,0 +1,239 @@
+"""Track Raman bands (position, width, height, area) through a time series.
+
+Every spectrum of a (time x shift) grid is fitted with one Lorentzian or
+pseudo-Voigt per band on a linear background, e.g. the D (~1320 cm⁻¹) and
+G (~1600 cm⁻¹) bands of the carbon in the LHCE3 runs:
+
+    table = track_bands(unique_times, unique_shifts, intensity_matrix)
+    plt.plot(table["time"], table["D_center"])
+    plt.plot(table["time"], table["ID_IG"])
+
+Initial guesses come from the data for all spectra at once; each fit then
+starts from the result of the previous spectrum, and consecutive blocks of
+spectra are fitted in parallel processes.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.optimize import least_squares
+
+DEFAULT_BANDS = {"D": 1320.0, "G": 1600.0}
+
+PEAK_MODELS = ("lorentzian", "voigt")
+
+# Area of a unit-height peak per unit FWHM
+LORENTZ_AREA = np.pi / 2
+GAUSS_AREA = np.sqrt(np.pi / (4 * np.log(2)))
+
+
+def _band_params(model):
+    return 4 if model == "voigt" else 3
+
+
+def band_model(x, params, n_bands, model="lorentzian"):
+    """Sum of peaks plus a linear background evaluated on ``x``.
+
+    ``params`` holds (center, height, fwhm[, eta]) for each band, then the
+    background offset and slope (slope per 1000 cm⁻¹ around the mean of ``x``).
+    """
+    per_band = _band_params(model)
+    x_mid = x.mean()
+    y = params[-2] + params[-1] * (x - x_mid) / 1000
+    for k in range(n_bands):
+        center, height, fwhm = params[k * per_band:k * per_band + 3]
+        u = (x - center) / (fwhm / 2)
+        lorentz = 1 / (1 + u * u)
+        if model == "voigt":
+            eta = params[k * per_band + 3]
+            gauss = np.exp(-np.log(2) * u * u)
+            y = y + height * (eta * lorentz + (1 - eta) * gauss)
+        else:
+            y = y + height * lorentz
+    return y
+
+
+def band_jacobian(x, params, n_bands, model="lorentzian"):
+    """Analytic derivatives of ``band_model`` with respect to ``params``."""
+    per_band = _band_params(model)
+    jacobian = np.empty((len(x), len(params)))
+    for k in range(n_bands):
+        center, height, fwhm = params[k * per_band:k * per_band + 3]
+        u = (x - center) / (fwhm / 2)
+        lorentz = 1 / (1 + u * u)
+        d_shape = -2 * u * lorentz * lorentz
+        shape = lorentz
+        if model == "voigt":
+            eta = params[k * per_band + 3]
+            gauss = np.exp(-np.log(2) * u * u)
+            shape = eta * lorentz + (1 - eta) * gauss
+            d_shape = eta * d_shape - (1 - eta) * 2 * np.log(2) * u * gauss
+            jacobian[:, k * per_band + 3] = height * (lorentz - gauss)
+        jacobian[:, k * per_band] = height * d_shape * (-2 / fwhm)
+        jacobian[:, k * per_band + 1] = shape
+        jacobian[:, k * per_band + 2] = height * d_shape * (-u / fwhm)
+    jacobian[:, -2] = 1.0
+    jacobian[:, -1] = (x - x.mean()) / 1000
+    return jacobian
+
+
+def initial_guesses(unique_shifts, intensity_matrix, bands, search_width=60.0, model="lorentzian"):
+    """Starting parameters for every spectrum at once, shape (n_spectra, n_params).
+
+    For each band the highest point within ``search_width`` of its nominal
+    position gives the center and height (above the spectrum's minimum);
+    the number of points above half of that height gives the width.
+    Raises ValueError naming the band when no shift lies that close to it.
+    """
+    shifts = np.asarray(unique_shifts, dtype=float)
+    matrix = np.asarray(intensity_matrix, dtype=float)
+    nearby = {}
+    for name, position in bands.items():
+        nearby[name] = np.flatnonzero(np.abs(shifts - position) <= search_width)
+        if len(nearby[name]) == 0:
+            shift_span = f"{shifts.min():g}-{shifts.max():g}" if len(shifts) else "none"
+            raise ValueError(f"band {name!r} at {position:g} cm⁻¹ has no shifts within {search_width:g} cm⁻¹ "
+                             f"(shifts: {shift_span} cm⁻¹)")
+    n_spectra = matrix.shape[0]
+    floor = np.nanmin(matrix, axis=1)
+    step = np.median(np.abs(np.diff(shifts)))
+
+    columns = []
+    for name in bands:
+        near = nearby[name]
+        window = np.nan_to_num(matrix[:, near] - floor[:, None], nan=0.0)
+        peak = np.argmax(window, axis=1)
+        height = np.maximum(window[np.arange(n_spectra), peak], 1e-12)
+        above = (window >= height[:, None] / 2).sum(axis=1)
+        fwhm = np.clip(above * step, 2 * step, 2 * search_width)
+        columns += [shifts[near][peak], height, fwhm]
+        if model == "voigt":
+            columns.append(np.full(n_spectra, 0.5))
+    columns += [floor, np.zeros(n_spectra)]
+    return np.column_stack(columns)
+
+
+def _bounds(shifts, bands, search_width, model):
+    low, high = [], []
+    for position in bands.values():
+        low += [position - search_width, 0.0, np.median(np.abs(np.diff(shifts)))]
+        high += [position + search_width, np.inf, 4 * search_width]
+        if model == "voigt":
+            low.append(0.0)
+            high.append(1.0)
+    low += [-np.inf, -np.inf]
+    high += [np.inf, np.inf]
+    return np.array(low), np.array(high)
+
+
+def _fit_block(shifts, block, guesses, bands, search_width, model):
+    """Fit consecutive spectra, each one warm-started from the previous fit."""
+    low, high = _bounds(shifts, bands, search_width, model)
+    n_bands = len(bands)
+    results = np.full((len(block), len(low) + 1), np.nan)
+    previous = None
+    for k, y in enumerate(block):
+        known = ~np.isnan(y)
+        if known.sum() <= len(low):
+            continue
+        start = guesses[k] if previous is None else previous
+        start = np.clip(start, low + 1e-9, high - 1e-9)
+        x = shifts[known]
+
+        def residual(params):
+            return band_model(x, params, n_bands, model) - y[known]
+
+        def jacobian(params):
+            return band_jacobian(x, params, n_bands, model)
+
+        fit = least_squares(residual, start, jac=jacobian, bounds=(low, high), x_scale="jac")
+        if not fit.success:
+            previous = None
+            continue
+        previous = fit.x
+        results[k, :-1] = fit.x
+        results[k, -1] = np.sqrt(np.mean(fit.fun ** 2))
+    return results
+
+
+def _table_dtype(bands, ratio, with_potential):
+    fields = [("time", float)]
+    if with_potential:
+        fields.append(("potential", float))
+    for name in bands:
+        fields += [(f"{name}_center", float), (f"{name}_fwhm", float),
+                   (f"{name}_height", float), (f"{name}_area", float)]
+    if ratio is not None:
+        a, b = ratio
+        fields += [(f"I{a}_I{b}", float), (f"A{a}_A{b}", float)]
+    fields.append(("rms", float))
+    return np.dtype(fields)
+
+
+def track_bands(unique_times, unique_shifts, intensity_matrix, bands=None, fit_window=None,
+                model="lorentzian", search_width=60.0, ratio=("D", "G"), potential=None,
+                workers=1, block_size=256):
+    """Fit every spectrum of a grid and return a per-time band table.
+
+    bands       -- {name: nominal position in cm⁻¹}, default D and G
+    fit_window  -- (low, high) shift range used for the fit; by default
+                   150 cm⁻¹ beyond the outermost bands
+    model       -- "lorentzian" or "voigt" (pseudo-Voigt, shared width)
+    ratio       -- pair of band names (keys of ``bands``) for the I_a/I_b
+                   height and area ratios, or None
+    potential   -- optional potential per spectrum (see potential.potential_at)
+    workers     -- processes for the blocks of ``block_size`` spectra; each
+                   block warm-starts from its own first guess
+
+    Returns a structured array with time, [potential,] center, fwhm, height
+    and area per band, the ratios and the fit's RMS residual. Spectra whose
+    fit failed have NaN fields.
+    """
+    if model not in PEAK_MODELS:
+        raise ValueError(f"model must be one of {PEAK_MODELS}, got {model!r}")
+    bands = dict(DEFAULT_BANDS if bands is None else bands)
+    if ratio is not None:
+        unknown = [name for name in ratio if name not in bands]
+        if unknown:
+            raise ValueError(f"ratio bands must be among {tuple(bands)}, got {unknown[0]!r}")
+
+    shifts = np.asarray(unique_shifts, dtype=float)
+    matrix = np.asarray(intensity_matrix, dtype=float)
+    if fit_window is None:
+        fit_window = (min(bands.values()) - 150, max(bands.values()) + 150)
+    columns = (shifts >= fit_window[0]) & (shifts <= fit_window[1])
+    if not columns.any():
+        grid_span = f"{shifts.min():g}-{shifts.max():g} cm⁻¹" if len(shifts) else "empty"
+        raise ValueError(f"no shifts of the grid ({grid_span}) inside the fit window "
+                         f"{fit_window[0]:g}-{fit_window[1]:g} cm⁻¹ of the bands {', '.join(bands)}")
+    shifts, matrix = shifts[columns], matrix[:, columns]
+
+    guesses = initial_guesses(shifts, matrix, bands, search_width, model)
+    starts = range(0, len(matrix), block_size)
+    jobs = [(shifts, matrix[s:s + block_size], guesses[s:s + block_size], bands, search_width, model)
+            for s in starts]
+    if workers is not None and workers <= 1:
+        results = [_fit_block(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_fit_block, *zip(*jobs)))
+    fitted = np.concatenate(results) if results else np.empty((0, 0))
+
+    table = np.zeros(len(matrix), dtype=_table_dtype(bands, ratio, potential is not None))
+    table["time"] = unique_times
+    if potential is not None:
+        table["potential"] = potential
+    per_band = _band_params(model)
+    for k, name in enumerate(bands):
+        center, height, fwhm = (fitted[:, k * per_band + j] for j in range(3))
+        eta = fitted[:, k * per_band + 3] if model == "voigt" else 1.0
+        table[f"{name}_center"] = center
+        table[f"{name}_fwhm"] = fwhm
+        table[f"{name}_height"] = height
+        table[f"{name}_area"] = height * fwhm * (eta * LORENTZ_AREA + (1 - eta) * GAUSS_AREA)
+    if ratio is not None:
+        a, b = ratio
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table[f"I{a}_I{b}"] = table[f"{a}_height"] / table[f"{b}_height"]
+            table[f"A{a}_A{b}"] = table[f"{a}_area"] / table[f"{b}_area"]
+    table["rms"] = fitted[:, -1]
+    return table
@@ -0,0 +1,185 @@
+import numpy as np
+
+from raman_io import iter_table_chunks, load_table
+
+# Helpers for the Time / Potential files (e.g. potential_data_LHCE3.txt, time
+# already in hours) and for lining them up with the Raman spectra.
+
+LOOKUP_MODES = ("nearest", "interp", "mean")
+
+# One row per charge or discharge segment
+CYCLE_DTYPE = np.dtype([
+    ("kind", "U9"),
+    ("start_time", float),
+    ("end_time", float),
+    ("start_potential", float),
+    ("end_potential", float),
+])
+
+
+def load_potential(file_path, use_cache=True):
+    """Load a Time / Potential export, returns ``(time, potential)`` sorted by time."""
+    data = load_table(file_path, use_cache=use_cache)
+    time, potential = data[:, 0], data[:, 1]
+    if np.any(np.diff(time) < 0):
+        order = np.argsort(time, kind="stable")
+        time, potential = time[order], potential[order]
+    return np.asarray(time), np.asarray(potential)
+
+
+def potential_at(spectrum_times, potential_times, potential, mode="nearest", window=None):
+    """Potential at each Raman acquisition time.
+
+    spectrum_times  -- times of the spectra, same unit as ``potential_times``
+                       (the Raman Time column / 3600 for the LHCE3 files)
+    potential_times -- sorted time column of the potential file
+    mode            -- "nearest" sample, linear "interp", or "mean" of the
+                       samples within ``window`` (full width) around each spectrum
+    Spectra outside the potential record get NaN.
+
+    All lookups go through one ``np.searchsorted`` over the sorted time column,
+    so the cost is O((N + M) log M) for N spectra and M potential samples.
+    """
+    if mode not in LOOKUP_MODES:
+        raise ValueError(f"mode must be one of {LOOKUP_MODES}, got {mode!r}")
+
+    spectrum_times = np.asarray(spectrum_times, dtype=float)
+    potential_times = np.asarray(potential_times, dtype=float)
+    potential = np.asarray(potential, dtype=float)
+    n = len(potential_times)
+
+    outside = (spectrum_times < potential_times[0]) | (spectrum_times > potential_times[-1])
+
+    if mode == "interp":
+        values = np.interp(spectrum_times, potential_times, potential)
+    elif mode == "nearest":
+        right = np.clip(np.searchsorted(potential_times, spectrum_times), 1, n - 1)
+        left = right - 1
+        closer_left = (spectrum_times - potential_times[left]) <= (potential_times[right] - spectrum_times)
+        values = potential[np.where(closer_left, left, right)]
+    else:
+        if window is None:
+            raise ValueError("mode='mean' needs a window width")
+        # Prefix sums turn every window average into two lookups
+        cumulative = np.concatenate([[0.0], np.cumsum(potential)])
+        low = np.searchsorted(potential_times, spectrum_times - window / 2, side="left")
+        high = np.searchsorted(potential_times, spectrum_times + window / 2, side="right")
+        counts = high - low
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = (cumulative[high] - cumulative[low]) / counts
+        values[counts == 0] = np.nan
+
+    values = np.asarray(values, dtype=float)
+    values[outside] = np.nan
+    return values
+
+
+class CycleDetector:
+    """Find charge/discharge turning points in a potential trace, chunk by chunk.
+
+    A turning point is a potential extremum after which the potential has moved
+    back by more than ``hysteresis`` volts, so noise and short relaxations do
+    not split a segment. Rising segments are "charge", falling ones "discharge".
+
+    Feed consecutive ``(time, potential)`` chunks with ``feed`` and call
+    ``cycles`` at the end. Only local extrema of each chunk are visited in
+    Python, the rest of the work is vectorized, so long files stay linear.
+    """
+
+    def __init__(self, hysteresis=0.05):
+        self.hysteresis = hysteresis
+        self.direction = 0  # +1 rising, -1 falling, 0 not known yet
+        self.segments = []
+        self.start = None   # (time, potential) where the current segment began
+        self.high = None    # running extremes (time, potential) since then
+        self.low = None
+
+    def feed(self, time, potential):
+        time = np.asarray(time, dtype=float)
+        potential = np.asarray(potential, dtype=float)
+        if len(time) == 0:
+            return
+
+        # Turning points can only sit on local extrema or plateaus, keep those
+        # plus both chunk ends
+        step = np.diff(potential)
+        turning = np.flatnonzero(step[:-1] * step[1:] <= 0) + 1
+        candidates = np.concatenate([[0], turning, [len(potential) - 1]])
+
+        for t, v in zip(time[candidates].tolist(), potential[candidates].tolist()):
+            self._visit(t, v)
+
+    def _visit(self, t, v):
+        if self.start is None:
+            self.start = self.high = self.low = (t, v)
+            return
+        if v > self.high[1]:
+            self.high = (t, v)
+        if v < self.low[1]:
+            self.low = (t, v)
+
+        if self.direction >= 0 and self.high[1] - v > self.hysteresis:
+            # Came down far enough from the maximum: it was the end of a charge
+            self._close("charge", self.high)
+            self.direction = -1
+            self.low = (t, v)
+        elif self.direction <= 0 and v - self.low[1] > self.hysteresis:
+            self._close("discharge", self.low)
+            self.direction = 1
+            self.high = (t, v)
+
+    def _close(self, kind, end):
+        # Before the first turning point the trace may just be resting, only
+        # keep that lead-in if it moved by more than the hysteresis itself
+        if self.direction != 0 or abs(end[1] - self.start[1]) > self.hysteresis:
+            self.segments.append((kind, self.start[0], end[0], self.start[1], end[1]))
+        self.start = self.high = self.low = end
+
+    def cycles(self):
+        """Cycle table so far, including the open segment at the end."""
+        segments = list(self.segments)
+        if self.direction != 0:
+            kind = "charge" if self.direction > 0 else "discharge"
+            end = self.high if self.direction > 0 else self.low
+            if end[0] > self.start[0]:
+                segments.append((kind, self.start[0], end[0], self.start[1], end[1]))
+        return np.array(segments, dtype=CYCLE_DTYPE)
+
+
+def detect_cycles(time, potential, hysteresis=0.05):
+    """Charge/discharge cycle table (``CYCLE_DTYPE``) for a potential trace."""
+    detector = CycleDetector(hysteresis)
+    detector.feed(time, potential)
+    return detector.cycles()
+
+
+def detect_cycles_in_file(file_path, hysteresis=0.05, chunk_rows=262144):
+    """Like ``detect_cycles`` but streams a Time / Potential file in chunks."""
+    detector = CycleDetector(hysteresis)
+    for chunk in iter_table_chunks(file_path, chunk_rows):
+        detector.feed(chunk[:, 0], chunk[:, 1])
+    return detector.cycles()
+
+
+def cycles_from_boundaries(charge_times, discharge_times, end_time=None):
+    """Cycle table from hand-typed charge and discharge start times.
+
+    Each segment runs until the next boundary; the last one until ``end_time``
+    (or ends where it starts when that is not given). Potentials are NaN.
+    """
+    boundaries = sorted([(t, "charge") for t in charge_times] + [(t, "discharge") for t in discharge_times])
+    segments = []
+    for k, (start, kind) in enumerate(boundaries):
+        if k + 1 < len(boundaries):
+            end = boundaries[k + 1][0]
+        else:
+            end = end_time if end_time is not None else start
+        segments.append((kind, start, end, np.nan, np.nan))
+    return np.array(segments, dtype=CYCLE_DTYPE)
+
+
+def charge_discharge_times(cycles):
+    """Start times of the charge and of the discharge segments of a cycle table."""
+    charge_times = cycles["start_time"][cycles["kind"] == "charge"]
+    discharge_times = cycles["start_time"][cycles["kind"] == "discharge"]
+    return charge_times.tolist(), discharge_times.tolist()
@@ -0,0 +1,124 @@
+import atexit
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Stage-level timing and memory measurement for the processing scripts:
+#
+#     profiler = StageProfiler("LHCE3 contour")
+#     with profiler.stage("loadtxt"):
+#         data = parse_table(file_path)
+#     ...
+#     print(profiler.summary())
+#     profiler.dump_json("profile.json")
+#
+# The pipeline functions (``grid_cache.build_grid`` / ``processed_grid``)
+# take an optional profiler and time their own stages, so the scripts and
+# benchmark.py measure the same code. Scripts opt in through the
+# RAMAN_PROFILE environment variable (see ``script_profiler``):
+#
+#     RAMAN_PROFILE=1 python "2D plot.py"             # summary on stderr at exit
+#     RAMAN_PROFILE=2d.json python "2D plot.py"       # and the stages as JSON
+#
+# Memory comes from tracemalloc, which also sees numpy's array buffers, and
+# works the same on Windows and Linux.
+
+
+class StageProfiler:
+    """Collects wall time, CPU time and memory of named, consecutive stages.
+
+    With ``trace_memory`` every stage reports the peak traced memory while it
+    ran and the memory it left allocated (both in MB). Tracing slows down
+    pure-Python code, so switch it off when only the times matter. Stages
+    should not be nested; a stage that appears twice is reported twice.
+    """
+
+    def __init__(self, name="run", trace_memory=True):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                "stage": name,
+                "seconds": time.perf_counter() - wall,
+                "cpu_seconds": time.process_time() - cpu,
+            }
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record["peak_mb"] = (peak - memory_before) / 1e6
+                record["allocated_mb"] = (current - memory_before) / 1e6
+            if started_tracing:
+                tracemalloc.stop()
+            self.records.append(record)
+
+    def total_seconds(self):
+        return sum(record["seconds"] for record in self.records)
+
+    def summary(self):
+        """Per-stage table of the run as text."""
+        total = self.total_seconds() or 1.0
+        lines = [f"{self.name}: {self.total_seconds():.3f} s",
+                 f"  {'stage':<14}{'seconds':>10}{'share':>8}{'cpu s':>10}{'peak MB':>10}{'kept MB':>10}"]
+        for record in self.records:
+            line = (f"  {record['stage']:<14}{record['seconds']:>10.3f}{record['seconds'] / total:>8.1%}"
+                    f"{record['cpu_seconds']:>10.3f}")
+            if "peak_mb" in record:
+                line += f"{record['peak_mb']:>10.1f}{record['allocated_mb']:>10.1f}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def to_dict(self, **extra):
+        """The run as a JSON-ready dict; ``extra`` is stored alongside (sizes, file ...)."""
+        return {
+            "name": self.name,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "total_seconds": self.total_seconds(),
+            "stages": list(self.records),
+            **extra,
+        }
+
+    def dump_json(self, file_path, **extra):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(**extra), f, indent=2)
+
+
+def profile_stage(profiler, name):
+    """``profiler.stage(name)``, or a no-op context without a profiler."""
+    return nullcontext() if profiler is None else profiler.stage(name)
+
+
+def _report(profiler, target):
+    print(profiler.summary(), file=sys.stderr)
+    if target.endswith(".json"):
+        profiler.dump_json(target)
+
+
+def script_profiler(name, env_var="RAMAN_PROFILE"):
+    """A ``StageProfiler`` reported at exit when ``env_var`` is set, else None.
+
+    The summary goes to stderr; a value ending in ".json" is also the path
+    of a JSON dump.
+    """
+    target = os.environ.get(env_var)
+    if not target:
+        return None
+    profiler = StageProfiler(name)
+    atexit.register(_report, profiler, target)
+    return profiler
@@ -0,0 +1,279 @@
+"""Browse a very long operando map with pan and zoom, without reloading it.
+
+Example (build the pyramid once, then browse with the cycle overlays):
+
+    python pyramid.py LHCE3-baselined.txt --window 1000 1750 --potential potential_data_LHCE3.txt
+
+The grid is stored once as a multiresolution pyramid: level 0 is the full
+(time x shift) grid and every further level halves both axes by averaging
+2 x 2 cells. Each level is a memory-mapped ``CompactGrid`` file. On every pan
+or zoom the viewer picks the coarsest level that still has as many cells in
+the view as the axes have pixels, and reads only the tiles of it that cover
+the view. It then redraws the image, the colorbar and the charge/discharge
+overlays, so the cost of a redraw follows the screen, not the length of the run.
+"""
+import argparse
+import glob
+import math
+import os
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import Normalize
+
+from compact_grid import CompactGrid
+from potential import detect_cycles_in_file
+from raman_io import CACHE_DIR_NAME, _source_stamp
+from raman_plots import add_cycle_overlays, axis_pixels, draw_raster
+
+TILE_SIZE = 256
+
+# Coarsest level is the first one with both axes at or below this size
+MIN_LEVEL_SIZE = 256
+
+
+def _halve_axis(values):
+    values = np.asarray(values, dtype=float)
+    pairs = len(values) // 2
+    halved = (values[0:2 * pairs:2] + values[1:2 * pairs:2]) / 2
+    return np.append(halved, values[2 * pairs:])
+
+
+def _halve(block):
+    """Average 2 x 2 cells of a block (an odd last row / column stays alone), skipping NaN."""
+    rows, cols = block.shape
+    padded = np.full((rows + rows % 2, cols + cols % 2), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = block
+    cells = padded.reshape(len(padded) // 2, 2, padded.shape[1] // 2, 2)
+    filled = ~np.isnan(cells)
+    counts = filled.sum(axis=(1, 3))
+    sums = np.where(filled, cells, 0).sum(axis=(1, 3), dtype=np.float32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return sums / counts
+
+
+class Pyramid:
+    """Levels of a (time x shift) grid, each half the size of the previous one.
+
+    ``levels[0]`` is the full grid; all levels are ``CompactGrid`` objects,
+    memory-mapped when opened from disk. ``view`` returns the part of one
+    level inside given limits, assembled from ``TILE_SIZE`` tiles that are
+    kept in a small least-recently-used cache.
+    """
+
+    def __init__(self, levels, max_tiles=512):
+        self.levels = levels
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+
+    @classmethod
+    def build(cls, grid, directory, min_size=MIN_LEVEL_SIZE, chunk_rows=16384):
+        """Write ``grid`` (a ``CompactGrid``) and its halved levels to ``directory``, then open them.
+
+        Every level is computed from the memory-mapped previous one in chunks
+        of ``chunk_rows`` spectra.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "level_*.rgrid")):
+            os.remove(path)
+        level = 0
+        grid.metadata["level"] = level
+        grid.save(os.path.join(directory, f"level_{level:02d}.rgrid"))
+        current = CompactGrid.load(os.path.join(directory, f"level_{level:02d}.rgrid"))
+        while max(current.intensity_matrix.shape) > min_size and min(current.intensity_matrix.shape) > 1:
+            chunk_rows -= chunk_rows % 2
+            matrix = np.concatenate([_halve(current.intensity_matrix[start:start + chunk_rows])
+                                     for start in range(0, len(current.intensity_matrix), chunk_rows)])
+            level += 1
+            halved = CompactGrid(_halve_axis(current.unique_times), _halve_axis(current.unique_shifts),
+                                 matrix, dict(current.metadata, level=level), dtype=grid.intensity_matrix.dtype.name)
+            halved.save(os.path.join(directory, f"level_{level:02d}.rgrid"))
+            current = CompactGrid.load(os.path.join(directory, f"level_{level:02d}.rgrid"))
+        return cls.open(directory)
+
+    @classmethod
+    def open(cls, directory, **options):
+        paths = sorted(glob.glob(os.path.join(directory, "level_*.rgrid")))
+        if not paths:
+            raise ValueError(f"{directory} holds no pyramid levels")
+        return cls([CompactGrid.load(path) for path in paths], **options)
+
+    @property
+    def metadata(self):
+        return self.levels[0].metadata
+
+    def level_for(self, time_limits, shift_limits, pixels):
+        """Coarsest level with at least as many cells in the view as ``pixels = (width, height)``.
+
+        Each level has a quarter of the cells of the previous one; an axis
+        that is still denser than the screen is averaged down when drawn.
+        """
+        full = self.levels[0]
+        n_times = max(np.count_nonzero((full.unique_times >= min(time_limits))
+                                       & (full.unique_times <= max(time_limits))), 1)
+        n_shifts = max(np.count_nonzero((full.unique_shifts >= min(shift_limits))
+                                        & (full.unique_shifts <= max(shift_limits))), 1)
+        factor = n_times * n_shifts / max(pixels[0] * pixels[1], 1)
+        level = int(math.floor(math.log2(factor) / 2)) if factor >= 1 else 0
+        return min(level, len(self.levels) - 1)
+
+    def _tile(self, level, row, col):
+        key = (level, row, col)
+        tile = self._tiles.get(key)
+        if tile is None:
+            matrix = self.levels[level].intensity_matrix
+            tile = np.array(matrix[row * TILE_SIZE:(row + 1) * TILE_SIZE, col * TILE_SIZE:(col + 1) * TILE_SIZE])
+            self._tiles[key] = tile
+            if len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+        return tile
+
+    def view(self, time_limits, shift_limits, level):
+        """``(unique_times, unique_shifts, intensity_matrix)`` of ``level`` inside the limits.
+
+        One cell is kept on each side so the image reaches the edges of the view.
+        """
+        grid = self.levels[level]
+        t0 = max(np.searchsorted(grid.unique_times, min(time_limits)) - 1, 0)
+        t1 = min(np.searchsorted(grid.unique_times, max(time_limits), side="right") + 1, len(grid.unique_times))
+        s0 = max(np.searchsorted(grid.unique_shifts, min(shift_limits)) - 1, 0)
+        s1 = min(np.searchsorted(grid.unique_shifts, max(shift_limits), side="right") + 1, len(grid.unique_shifts))
+        if t1 <= t0 or s1 <= s0:
+            return grid.unique_times[t0:t1], grid.unique_shifts[s0:s1], np.empty((max(t1 - t0, 0), max(s1 - s0, 0)))
+
+        tile_rows = range(t0 // TILE_SIZE, (t1 - 1) // TILE_SIZE + 1)
+        tile_cols = range(s0 // TILE_SIZE, (s1 - 1) // TILE_SIZE + 1)
+        stitched = np.block([[self._tile(level, row, col) for col in tile_cols] for row in tile_rows])
+        origin_t, origin_s = tile_rows[0] * TILE_SIZE, tile_cols[0] * TILE_SIZE
+        matrix = stitched[t0 - origin_t:t1 - origin_t, s0 - origin_s:s1 - origin_s]
+        return grid.unique_times[t0:t1], grid.unique_shifts[s0:s1], matrix
+
+
+class PyramidViewer:
+    """Raster map of a ``Pyramid`` that refetches the right level on every pan / zoom.
+
+    The color scale follows the visible data unless ``color_limits`` is
+    given; ``cycles`` (a ``potential.CYCLE_DTYPE`` table) is redrawn with
+    the labels centred in the view.
+    """
+
+    def __init__(self, ax, pyramid, cycles=None, cmap="plasma", color_limits=None):
+        self.ax = ax
+        self.pyramid = pyramid
+        self.cycles = cycles
+        self.cmap = cmap
+        self.color_limits = color_limits
+        self.artist = None
+        self.colorbar = None
+        self.overlays = []
+        self.level = None
+        self._updating = False
+
+        full = pyramid.levels[0]
+        ax.set_xlabel("Raman Shift (cm⁻¹)")
+        ax.set_ylabel("Time (hours)")
+        ax.set_xlim(full.unique_shifts[0], full.unique_shifts[-1])
+        # Time runs downwards like in the saved figures
+        ax.set_ylim(full.unique_times[-1], full.unique_times[0])
+        ax.set_autoscale_on(False)
+        self.update()
+        ax.callbacks.connect("xlim_changed", self._limits_changed)
+        ax.callbacks.connect("ylim_changed", self._limits_changed)
+
+    def _limits_changed(self, ax):
+        self.update()
+        ax.figure.canvas.draw_idle()
+
+    def update(self):
+        """Fetch the level and tiles for the current limits and redraw."""
+        if self._updating:
+            return
+        self._updating = True
+        try:
+            shift_limits, time_limits = self.ax.get_xlim(), self.ax.get_ylim()
+            self.level = self.pyramid.level_for(time_limits, shift_limits, axis_pixels(self.ax))
+            unique_times, unique_shifts, intensity_matrix = self.pyramid.view(time_limits, shift_limits, self.level)
+            if intensity_matrix.size == 0:
+                return
+            low, high = self.color_limits or (np.nanmin(intensity_matrix), np.nanmax(intensity_matrix))
+            norm = Normalize(low, high if high > low else low + 1)
+
+            if self.artist is not None:
+                self.artist.remove()
+            self.artist = draw_raster(self.ax, unique_shifts, unique_times, intensity_matrix, cmap=self.cmap, norm=norm)
+            if self.colorbar is None:
+                self.colorbar = self.ax.figure.colorbar(self.artist, ax=self.ax)
+                self.colorbar.set_label("Intensity (a.u.)")
+            else:
+                self.colorbar.update_normal(self.artist)
+
+            for artist in self.overlays:
+                artist.remove()
+            self.overlays = []
+            if self.cycles is not None:
+                visible = self.cycles[(self.cycles["end_time"] >= min(time_limits))
+                                      & (self.cycles["start_time"] <= max(time_limits))].copy()
+                # Clipped to the view so every label sits in the visible part of its segment
+                visible["start_time"] = np.maximum(visible["start_time"], min(time_limits))
+                visible["end_time"] = np.minimum(visible["end_time"], max(time_limits))
+                self.overlays = add_cycle_overlays(self.ax, visible, x=np.mean(shift_limits))
+            self.ax.set_title(f"Operando Raman map (level {self.level}, {intensity_matrix.shape[0]} x "
+                              f"{intensity_matrix.shape[1]} cells)")
+        finally:
+            self._updating = False
+
+
+def pyramid_dir(file_path, shift_range=None, time_range=None):
+    """Default pyramid directory of an export, next to the other caches."""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    for limits in (shift_range, time_range):
+        if limits is not None:
+            name += f"_{limits[0]:g}-{limits[1]:g}"
+    return os.path.join(CACHE_DIR_NAME, "pyramids", name)
+
+
+def export_pyramid(file_path, directory=None, shift_range=None, time_range=None, time_unit=3600,
+                   dtype="float32", rebuild=False):
+    """Open the pyramid of an export, building it first when missing or out of date."""
+    directory = directory or pyramid_dir(file_path, shift_range, time_range)
+    stamp = _source_stamp(file_path)
+    if not rebuild:
+        try:
+            pyramid = Pyramid.open(directory)
+        except ValueError:
+            pyramid = None
+        if pyramid is not None and pyramid.metadata.get("stamp") == stamp:
+            return pyramid
+    grid = CompactGrid.from_export(file_path, shift_range, time_range, time_unit, dtype)
+    grid.metadata["stamp"] = stamp
+    return Pyramid.build(grid, directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pan / zoom viewer for long operando Raman maps.")
+    parser.add_argument("file_path", help="Time/Ramanshift/Intensity export")
+    parser.add_argument("--window", nargs=2, type=float, metavar=("LOW", "HIGH"),
+                        help="Raman shift window in cm⁻¹ kept in the pyramid (default: all)")
+    parser.add_argument("--time-range", nargs=2, type=float, metavar=("START", "END"),
+                        help="time window in hours kept in the pyramid (default: all)")
+    parser.add_argument("--time-unit", type=float, default=3600, help="divisor of the Time column")
+    parser.add_argument("--potential", help="potential export for the charge/discharge overlays")
+    parser.add_argument("--clim", nargs=2, type=float, metavar=("VMIN", "VMAX"),
+                        help="fixed color scale (default: follows the view)")
+    parser.add_argument("--dir", help="pyramid directory (default: under .raman_cache/pyramids)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the pyramid even if it is up to date")
+    args = parser.parse_args(argv)
+
+    pyramid = export_pyramid(args.file_path, args.dir, args.window, args.time_range, args.time_unit,
+                             rebuild=args.rebuild)
+    cycles = detect_cycles_in_file(args.potential) if args.potential else None
+    fig, ax = plt.subplots(figsize=(10, 7))
+    PyramidViewer(ax, pyramid, cycles, color_limits=args.clim)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+import numpy as np
+
+# Shared helpers for turning the long Time / Ramanshift / Intensity exports
+# into (time x shift) intensity matrices.
+
+DUPLICATE_MODES = ("first", "last", "mean")
+
+
+def pivot_to_grid(time, raman_shift, intensity, duplicates="first", missing=0.0):
+    """Pivot long-format columns into a (time x shift) intensity matrix.
+
+    Returns ``(unique_times, unique_shifts, intensity_matrix)``. Every row is
+    placed with one scatter, so the cost grows with the number of rows instead
+    of times x shifts x rows.
+
+    duplicates -- what to keep when a (time, shift) pair appears more than
+                  once: "first", "last" or "mean"
+    missing    -- value for cells with no data (0.0 like the old loops, or np.nan)
+    """
+    if duplicates not in DUPLICATE_MODES:
+        raise ValueError(f"duplicates must be one of {DUPLICATE_MODES}, got {duplicates!r}")
+
+    time = np.asarray(time)
+    raman_shift = np.asarray(raman_shift)
+    intensity = np.asarray(intensity, dtype=float)
+
+    unique_times, time_index = np.unique(time, return_inverse=True)
+    unique_shifts, shift_index = np.unique(raman_shift, return_inverse=True)
+    n_times, n_shifts = len(unique_times), len(unique_shifts)
+
+    # One flat cell number per row
+    cell = time_index.ravel() * n_shifts + shift_index.ravel()
+    intensity_matrix = np.full(n_times * n_shifts, missing, dtype=float)
+
+    if duplicates == "mean":
+        sums = np.bincount(cell, weights=intensity, minlength=n_times * n_shifts)
+        counts = np.bincount(cell, minlength=n_times * n_shifts)
+        filled = counts > 0
+        intensity_matrix[filled] = sums[filled] / counts[filled]
+    else:
+        if duplicates == "last":
+            # Reverse so that the first hit in the reversed order is the last row
+            cell = cell[::-1]
+            intensity = intensity[::-1]
+        cells, first_rows = np.unique(cell, return_index=True)
+        intensity_matrix[cells] = intensity[first_rows]
+
+    return unique_times, unique_shifts, intensity_matrix.reshape(n_times, n_shifts)
+
+
+def window_views(unique_times, unique_shifts, intensity_matrix, shift_window=None, time_window=None):
+    """Return ``(times, shifts, matrix)`` views for one window of a grid.
+
+    Both axes must be sorted (as returned by ``pivot_to_grid``); the window
+    bounds are inclusive and found with ``np.searchsorted``, so nothing is copied.
+    """
+    rows = slice(None)
+    columns = slice(None)
+    if time_window is not None:
+        rows = slice(np.searchsorted(unique_times, time_window[0], side="left"),
+                     np.searchsorted(unique_times, time_window[1], side="right"))
+    if shift_window is not None:
+        columns = slice(np.searchsorted(unique_shifts, shift_window[0], side="left"),
+                        np.searchsorted(unique_shifts, shift_window[1], side="right"))
+    return unique_times[rows], unique_shifts[columns], intensity_matrix[rows, columns]
+
+
+def extract_windows(time, raman_shift, intensity, shift_windows, time_window=None,
+                    duplicates="first", missing=0.0):
+    """Grid several Raman shift windows in one pass over the data.
+
+    Only rows inside at least one of ``shift_windows`` (and inside
+    ``time_window`` if given) are pivoted, into one shared matrix. Every
+    window is then a column slice of that matrix.
+
+    Returns ``(unique_times, windows)`` where ``windows`` is a list of
+    ``(shifts, matrix)`` views in the same order as ``shift_windows``.
+    """
+    raman_shift = np.asarray(raman_shift)
+    time = np.asarray(time)
+
+    # Mark the wanted shift values once on the unique axis, then pick the
+    # rows through the inverse index: one pass over the data for all windows
+    unique_shifts, shift_index = np.unique(raman_shift, return_inverse=True)
+    wanted = np.zeros(len(unique_shifts), dtype=bool)
+    for low, high in shift_windows:
+        wanted[np.searchsorted(unique_shifts, low, side="left"):
+               np.searchsorted(unique_shifts, high, side="right")] = True
+    keep = wanted[shift_index.reshape(raman_shift.shape)]
+    if time_window is not None:
+        keep &= (time >= time_window[0]) & (time <= time_window[1])
+
+    unique_times, unique_shifts, intensity_matrix = pivot_to_grid(
+        time[keep], raman_shift[keep], np.asarray(intensity)[keep],
+        duplicates=duplicates, missing=missing,
+    )
+
+    windows = []
+    for shift_window in shift_windows:
+        _, shifts, matrix = window_views(unique_times, unique_shifts, intensity_matrix, shift_window)
+        windows.append((shifts, matrix))
+    return unique_times, windows
+
+
+INTERPOLATION_KINDS = ("linear", "cubic")
+
+
+def _interpolate_spectra(x, y, starts, ends, shift_axis, kind):
+    # Interpolate the spectra held in x, y (sorted by spectrum, then shift;
+    # spectrum k in rows starts[k]..ends[k]) onto shift_axis in one batch.
+    # Offsetting every spectrum by its number makes the whole column one
+    # sorted key, so a single searchsorted finds the left neighbour of every cell
+    n_spectra = len(starts)
+    spectrum = np.repeat(np.arange(n_spectra), ends - starts + 1)
+    x_min = min(x.min(), shift_axis.min())
+    span = max(x.max(), shift_axis.max()) - x_min + 1.0
+    key = (x - x_min) + spectrum * span
+    query = (shift_axis - x_min)[None, :] + (np.arange(n_spectra) * span)[:, None]
+
+    left = np.searchsorted(key, query, side="right") - 1
+    left = np.clip(left, starts[:, None], np.maximum(ends - 1, starts)[:, None])
+    right = np.minimum(left + 1, ends[:, None])
+
+    x0, y0 = x[left], y[left]
+    h = x[right] - x0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u = np.where(h > 0, (shift_axis[None, :] - x0) / h, 0.0)
+    dy = y[right] - y0
+
+    if kind == "linear":
+        u *= dy
+        u += y0
+        return u
+    # Cubic Hermite with finite-difference slopes, one-sided at both ends of
+    # each spectrum
+    rows = np.arange(len(x))
+    previous = rows - 1
+    previous[starts] = starts
+    following = rows + 1
+    following[ends] = ends
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.nan_to_num((y[following] - y[previous]) / (x[following] - x[previous]))
+    u2 = u * u
+    u3 = u2 * u
+    return (y0 + (3 * u2 - 2 * u3) * dy + (u3 - 2 * u2 + u) * h * slope[left]
+            + (u3 - u2) * h * slope[right])
+
+
+def resample_spectra(time, raman_shift, intensity, step=None, shift_range=None,
+                     shift_axis=None, kind="linear", missing=np.nan, block_rows=128):
+    """Interpolate every spectrum onto one common Raman shift axis.
+
+    The exports do not always repeat exactly the same shift values from one
+    spectrum to the next, which makes ``np.unique(raman_shift)`` much longer
+    than a single spectrum and the pivoted grid mostly empty. Here each
+    spectrum is interpolated instead, ``block_rows`` spectra per batched
+    operation, into one preallocated matrix.
+
+    step        -- spacing of an evenly spaced common axis in cm⁻¹; by default
+                   the axis is the first spectrum's own shifts, so the grid
+                   has no more columns than a measured spectrum
+    shift_range -- (low, high) to limit the axis; by default it covers the
+                   range shared by all spectra
+    shift_axis  -- explicit axis to use instead of ``step`` / ``shift_range``
+    kind        -- "linear" or "cubic" (piecewise cubic Hermite)
+    missing     -- value where a spectrum does not cover the axis
+
+    Returns ``(unique_times, shift_axis, intensity_matrix)`` like ``pivot_to_grid``.
+    """
+    if kind not in INTERPOLATION_KINDS:
+        raise ValueError(f"kind must be one of {INTERPOLATION_KINDS}, got {kind!r}")
+
+    time = np.asarray(time)
+    raman_shift = np.asarray(raman_shift, dtype=float)
+    intensity = np.asarray(intensity, dtype=float)
+
+    unique_times, time_index = np.unique(time, return_inverse=True)
+    time_index = time_index.ravel()
+    n_times = len(unique_times)
+
+    # Rows sorted by spectrum, then by shift inside each spectrum
+    order = np.lexsort((raman_shift, time_index))
+    x = raman_shift[order]
+    y = intensity[order]
+    del order
+
+    counts = np.bincount(time_index, minlength=n_times)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    ends = starts + counts - 1
+
+    if shift_axis is None:
+        low, high = x[starts].max(), x[ends].min()
+        if shift_range is not None:
+            low, high = max(low, shift_range[0]), min(high, shift_range[1])
+        if step is None:
+            first = x[starts[0]:ends[0] + 1]
+            shift_axis = np.unique(first[(first >= low) & (first <= high)])
+        else:
+            shift_axis = low + step * np.arange(int(np.floor((high - low) / step + 1e-9)) + 1)
+    shift_axis = np.asarray(shift_axis, dtype=float)
+
+    intensity_matrix = np.empty((n_times, len(shift_axis)))
+    for first_row in range(0, n_times, block_rows):
+        rows = slice(first_row, min(first_row + block_rows, n_times))
+        offset = starts[rows][0]
+        cells = slice(offset, ends[rows][-1] + 1)
+        intensity_matrix[rows] = _interpolate_spectra(x[cells], y[cells], starts[rows] - offset,
+                                                      ends[rows] - offset, shift_axis, kind)
+        covered = ((shift_axis[None, :] >= x[starts[rows]][:, None])
+                   & (shift_axis[None, :] <= x[ends[rows]][:, None]))
+        covered &= (counts[rows] > 1)[:, None]
+        intensity_matrix[rows][~covered] = missing
+    return unique_times, shift_axis, intensity_matrix
+
+
+def resample_times(unique_times, intensity_matrix, time_axis, missing=np.nan):
+    """Linearly interpolate a (time x shift) grid onto ``time_axis``.
+
+    Every column is interpolated at once between the two spectra around
+    each new time; times outside the recorded ones get ``missing``.
+    Returns the new (len(time_axis) x shifts) matrix.
+    """
+    unique_times = np.asarray(unique_times, dtype=float)
+    time_axis = np.asarray(time_axis, dtype=float)
+    intensity_matrix = np.asarray(intensity_matrix)
+    if len(unique_times) < 2:
+        resampled = np.full((len(time_axis), intensity_matrix.shape[1]), missing, dtype=float)
+        resampled[np.isin(time_axis, unique_times)] = intensity_matrix[:1]
+        return resampled
+
+    right = np.clip(np.searchsorted(unique_times, time_axis), 1, len(unique_times) - 1)
+    left = right - 1
+    weight = ((time_axis - unique_times[left]) / (unique_times[right] - unique_times[left]))[:, None]
+    resampled = intensity_matrix[left] * (1 - weight) + intensity_matrix[right] * weight
+    resampled[(time_axis < unique_times[0]) | (time_axis > unique_times[-1])] = missing
+    return resampled
+
+
+def _bin_edges(n, n_bins):
+    # Start index of every bin when n items are split into n_bins near-equal bins
+    return np.unique(np.linspace(0, n, n_bins + 1).astype(int)[:-1])
+
+
+def downsample_grid(unique_times, unique_shifts, intensity_matrix, max_rows=None, max_cols=None):
+    """Average a grid down to at most ``max_rows`` x ``max_cols`` cells.
+
+    Neighbouring rows / columns are averaged in blocks (NaN cells are skipped)
+    and the axes become the block means. Axes that are already small enough
+    are left alone.
+    """
+    intensity_matrix = np.asarray(intensity_matrix, dtype=float)
+    for axis, limit in ((0, max_rows), (1, max_cols)):
+        n = intensity_matrix.shape[axis]
+        if limit is None or n <= limit:
+            continue
+        starts = _bin_edges(n, limit)
+        filled = ~np.isnan(intensity_matrix)
+        sums = np.add.reduceat(np.where(filled, intensity_matrix, 0.0), starts, axis=axis)
+        counts = np.add.reduceat(filled, starts, axis=axis)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            intensity_matrix = sums / counts
+        sizes = np.diff(np.append(starts, n))
+        if axis == 0:
+            unique_times = np.add.reduceat(np.asarray(unique_times, dtype=float), starts) / sizes
+        else:
+            unique_shifts = np.add.reduceat(np.asarray(unique_shifts, dtype=float), starts) / sizes
+    return unique_times, unique_shifts, intensity_matrix
+
+
+def decimate_surface(unique_times, unique_shifts, intensity_matrix, max_polygons=20000, shift_mode="max"):
+    """Reduce a grid to about ``max_polygons`` surface cells while keeping peaks.
+
+    Rows (spectra) are taken with a regular stride, the last one always kept.
+    Columns are binned along the shift axis:
+
+    "max"    -- one column per bin holding the bin maximum, at the bin's mean
+                shift, so band heights such as D (~1320) and G (~1600) survive
+    "minmax" -- two columns per bin, the bin minimum at its first shift and
+                the maximum at its last, keeping both peaks and valleys
+
+    Grids already within budget are returned unchanged.
+    """
+    if shift_mode not in ("max", "minmax"):
+        raise ValueError(f"shift_mode must be 'max' or 'minmax', got {shift_mode!r}")
+    intensity_matrix = np.asarray(intensity_matrix)
+    n_times, n_shifts = intensity_matrix.shape
+    if n_times * n_shifts <= max_polygons:
+        return unique_times, unique_shifts, intensity_matrix
+
+    # Share the budget between both axes in proportion to their length
+    scale = np.sqrt(max_polygons / (n_times * n_shifts))
+    n_rows = int(np.clip(round(n_times * scale), 2, n_times))
+    n_cols = int(np.clip(max_polygons // n_rows, 2, n_shifts))
+
+    rows = np.unique(np.append(np.linspace(0, n_times - 1, n_rows).astype(int), n_times - 1))
+    unique_times = np.asarray(unique_times)[rows]
+    intensity_matrix = intensity_matrix[rows]
+
+    if n_cols < n_shifts:
+        unique_shifts = np.asarray(unique_shifts, dtype=float)
+        n_bins = n_cols if shift_mode == "max" else max(n_cols // 2, 1)
+        starts = _bin_edges(n_shifts, n_bins)
+        stops = np.append(starts[1:], n_shifts) - 1
+        highs = np.maximum.reduceat(intensity_matrix, starts, axis=1)
+        if shift_mode == "max":
+            sizes = stops - starts + 1
+            unique_shifts = np.add.reduceat(unique_shifts, starts) / sizes
+            intensity_matrix = highs
+        else:
+            lows = np.minimum.reduceat(intensity_matrix, starts, axis=1)
+            unique_shifts = np.column_stack([unique_shifts[starts], unique_shifts[stops]]).ravel()
+            intensity_matrix = np.stack([lows, highs], axis=2).reshape(len(rows), -1)
+            # Single-column bins would repeat the same shift twice
+            keep = np.concatenate([[True], np.diff(unique_shifts) > 0])
+            unique_shifts, intensity_matrix = unique_shifts[keep], intensity_matrix[:, keep]
+    return unique_times, unique_shifts, intensity_matrix
+
+
+class GrowingGrid:
+    """(time x shift) grid that grows as spectra are appended.
+
+    Rows live in a preallocated buffer whose capacity doubles when full, so
+    appending a spectrum is amortized O(1) and never re-grids the earlier ones.
+    Rows with the time of an existing spectrum fill that spectrum (a spectrum
+    may arrive over several reads), an out-of-order time is inserted at its
+    sorted position, and new shift values widen the axis like ``pivot_to_grid``
+    would. Cells without data hold ``missing``.
+
+    shift_range -- (low, high) in cm⁻¹, rows outside it are dropped
+    time_unit   -- the Time column is divided by this (3600 gives hours)
+    """
+
+    def __init__(self, shift_range=None, time_unit=1.0, initial_rows=256, missing=np.nan):
+        self.shift_range = shift_range
+        self.time_unit = time_unit
+        self.initial_rows = initial_rows
+        self.missing = missing
+        self.clear()
+
+    def clear(self):
+        self.n_rows = 0
+        self.unique_shifts = np.empty(0)
+        self._times = np.empty(0)
+        self._matrix = np.empty((0, 0))
+
+    @property
+    def unique_times(self):
+        return self._times[:self.n_rows]
+
+    @property
+    def intensity_matrix(self):
+        return self._matrix[:self.n_rows]
+
+    def _reserve(self, n_rows):
+        capacity = len(self._times)
+        if n_rows <= capacity:
+            return
+        capacity = max(capacity, self.initial_rows)
+        while capacity < n_rows:
+            capacity *= 2
+        times = np.empty(capacity)
+        times[:self.n_rows] = self.unique_times
+        matrix = np.full((capacity, len(self.unique_shifts)), self.missing, dtype=float)
+        matrix[:self.n_rows] = self.intensity_matrix
+        self._times, self._matrix = times, matrix
+
+    def _widen_axis(self, shifts):
+        unique_shifts = np.union1d(self.unique_shifts, shifts)
+        matrix = np.full((len(self._times), len(unique_shifts)), self.missing, dtype=float)
+        matrix[:, np.searchsorted(unique_shifts, self.unique_shifts)] = self._matrix
+        self.unique_shifts, self._matrix = unique_shifts, matrix
+
+    def _columns(self, shifts):
+        columns = np.searchsorted(self.unique_shifts, shifts)
+        if np.all(columns < len(self.unique_shifts)) and np.array_equal(self.unique_shifts[columns], shifts):
+            return columns
+        self._widen_axis(shifts)
+        return np.searchsorted(self.unique_shifts, shifts)
+
+    def _row_for(self, t):
+        n = self.n_rows
+        row = np.searchsorted(self._times[:n], t)
+        if row < n and self._times[row] == t:
+            return row
+        self._reserve(n + 1)
+        if row < n:
+            # Out-of-order spectrum: move the later rows down by one
+            self._times[row + 1:n + 1] = self._times[row:n]
+            self._matrix[row + 1:n + 1] = self._matrix[row:n]
+        self._times[row] = t
+        self._matrix[row] = self.missing
+        self.n_rows = n + 1
+        return row
+
+    def append(self, time, raman_shift, intensity):
+        """Add long-format rows; returns the number of spectra that changed."""
+        time = np.asarray(time, dtype=float) / self.time_unit
+        raman_shift = np.asarray(raman_shift, dtype=float)
+        intensity = np.asarray(intensity, dtype=float)
+        if self.shift_range is not None:
+            keep = (raman_shift >= self.shift_range[0]) & (raman_shift <= self.shift_range[1])
+            time, raman_shift, intensity = time[keep], raman_shift[keep], intensity[keep]
+        if len(time) == 0:
+            return 0
+
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(time) != 0) + 1, [len(time)]])
+        for start, stop in zip(starts[:-1], starts[1:]):
+            columns = self._columns(raman_shift[start:stop])
+            row = self._row_for(time[start])
+            self._matrix[row, columns] = intensity[start:stop]
+        return len(starts) - 1
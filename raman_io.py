@@ -0,0 +1,375 @@
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+
+# Loading of the tab-separated text exports (Time / Ramanshift / Intensity and
+# Time / Potential). The first parse of a file is stored next to it as a binary
+# .npy block, later runs memory-map that block instead of re-parsing the text.
+
+CACHE_DIR_NAME = ".raman_cache"
+
+# Block size of scan_spectra, small so the scan that sizes the grid of
+# stream_to_grid stays well below the size of that grid
+_SCAN_BYTES = 1 << 20
+
+# Bytes of the Time field compared between rows (the exports use up to 22)
+_FIELD_WIDTH = 32
+
+# Row n keeps the first n bytes of a field, as 64-bit words
+_FIELD_MASKS = (np.arange(_FIELD_WIDTH)[None, :] < np.arange(_FIELD_WIDTH + 1)[:, None])
+_FIELD_MASKS = (_FIELD_MASKS * np.uint8(255)).astype(np.uint8).view(np.uint64)
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents, read in chunks."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_paths(file_path, cache_dir=None):
+    """Return the (.npy, .json) cache paths used for ``file_path``."""
+    file_path = os.path.abspath(file_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(file_path), CACHE_DIR_NAME)
+    base = os.path.join(cache_dir, os.path.basename(file_path))
+    return base + ".npy", base + ".json"
+
+
+def _source_stamp(file_path):
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def parse_table(file_path, skiprows=1):
+    """Parse a whitespace-separated export with a one-line header."""
+    return np.loadtxt(file_path, skiprows=skiprows, ndmin=2)
+
+
+def load_table(file_path, use_cache=True, cache_dir=None, skiprows=1):
+    """Load a text export as a 2D float array, one column per field.
+
+    Works as a drop-in for ``np.loadtxt(file_path, skiprows=1)`` on both the
+    Raman exports and the Time / Potential files (scientific notation is fine).
+
+    With ``use_cache`` the parsed table is saved once as a column-major .npy
+    file in ``.raman_cache/`` next to the source, and later calls open it with
+    ``np.load(mmap_mode="r")``. The cache is reused while the source size and
+    mtime are unchanged; if only the mtime moved, the content hash decides.
+    The returned array is read-only in that case, copy it before editing.
+    """
+    if not use_cache:
+        return parse_table(file_path, skiprows)
+
+    npy_path, meta_path = cache_paths(file_path, cache_dir)
+    stamp = _source_stamp(file_path)
+    meta = _read_meta(meta_path)
+
+    if meta is not None and os.path.exists(npy_path) and meta.get("skiprows") == skiprows:
+        if meta.get("size") == stamp["size"] and meta.get("mtime_ns") == stamp["mtime_ns"]:
+            return np.load(npy_path, mmap_mode="r")
+        # Touched but maybe not changed (copied, re-synced ...)
+        if meta.get("size") == stamp["size"] and meta.get("sha1") == file_digest(file_path):
+            meta.update(stamp)
+            _write_meta(meta_path, meta)
+            return np.load(npy_path, mmap_mode="r")
+
+    data = parse_table(file_path, skiprows)
+
+    try:
+        os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+        tmp_path = npy_path + ".tmp.npy"
+        # Fortran order keeps every column contiguous on disk
+        np.save(tmp_path, np.asfortranarray(data))
+        os.replace(tmp_path, npy_path)
+        meta = dict(stamp, sha1=file_digest(file_path), skiprows=skiprows, shape=list(data.shape))
+        _write_meta(meta_path, meta)
+    except OSError:
+        # Read-only location: still return the parsed data
+        return data
+
+    return np.load(npy_path, mmap_mode="r")
+
+
+def source_digest(file_path, cache_dir=None):
+    """SHA-1 of a source file, reusing the hash stored with its binary cache.
+
+    The file is only re-hashed when its size or mtime changed since the hash
+    was recorded, so large exports are not read again on every run.
+    """
+    npy_path, meta_path = cache_paths(file_path, cache_dir)
+    stamp = _source_stamp(file_path)
+    meta = _read_meta(meta_path)
+    if (meta is not None and meta.get("sha1") and meta.get("size") == stamp["size"]
+            and meta.get("mtime_ns") == stamp["mtime_ns"]):
+        return meta["sha1"]
+
+    digest = file_digest(file_path)
+    try:
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        if meta is not None and meta.get("sha1") == digest:
+            meta.update(stamp)
+        else:
+            # Hash only, so a stale .npy next to it is not marked as valid again
+            meta = dict(stamp, sha1=digest)
+        _write_meta(meta_path, meta)
+    except OSError:
+        pass
+    return digest
+
+
+def load_columns(file_path, use_cache=True, cache_dir=None):
+    """Load an export and return its columns as a tuple of 1D arrays."""
+    data = load_table(file_path, use_cache=use_cache, cache_dir=cache_dir)
+    return tuple(data[:, k] for k in range(data.shape[1]))
+
+
+def clear_cache(file_path, cache_dir=None):
+    """Remove the cached binary copy of ``file_path`` if there is one."""
+    for path in cache_paths(file_path, cache_dir):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def iter_table_chunks(file_path, chunk_rows=65536, skiprows=1):
+    """Yield a text export as consecutive 2D float blocks of ``chunk_rows`` rows."""
+    with open(file_path, encoding="utf-8") as f:
+        for _ in range(skiprows):
+            next(f, None)
+        while True:
+            lines = [line for line in itertools.islice(f, chunk_rows) if line.strip()]
+            if not lines:
+                return
+            yield np.loadtxt(lines, ndmin=2)
+
+
+def iter_spectra(file_path, shift_range=None, time_range=None, time_unit=1.0,
+                 chunk_rows=65536, skiprows=1):
+    """Stream a Time / Ramanshift / Intensity export one spectrum at a time.
+
+    Yields ``(time, raman_shift, intensity)`` where ``time`` is a float and the
+    other two are 1D arrays for that spectrum. Rows are expected to be grouped
+    by Time in increasing order, as the spectrometer writes them.
+
+    shift_range -- (low, high) in cm⁻¹, inclusive, applied to every spectrum
+    time_range  -- (low, high), inclusive, in ``time_unit``; reading stops as
+                   soon as a spectrum is past ``high``
+    time_unit   -- the Time column is divided by this (3600 gives hours)
+
+    Only ``chunk_rows`` lines plus the current spectrum are held in memory.
+    """
+    time_low, time_high = time_range if time_range is not None else (-np.inf, np.inf)
+
+    def finish(rows):
+        t = rows[0, 0] / time_unit
+        if t < time_low:
+            return None
+        shift, intensity = rows[:, 1], rows[:, 2]
+        if shift_range is not None:
+            keep = (shift >= shift_range[0]) & (shift <= shift_range[1])
+            shift, intensity = shift[keep], intensity[keep]
+        return t, shift, intensity
+
+    pending = None
+    for chunk in iter_table_chunks(file_path, chunk_rows, skiprows):
+        if pending is not None:
+            chunk = np.concatenate([pending, chunk])
+
+        # Start row of every spectrum in this chunk
+        starts = np.flatnonzero(np.diff(chunk[:, 0]) != 0) + 1
+        starts = np.concatenate([[0], starts])
+
+        # The last spectrum may continue in the next chunk
+        for start, stop in zip(starts[:-1], starts[1:]):
+            if chunk[start, 0] / time_unit > time_high:
+                return
+            spectrum = finish(chunk[start:stop])
+            if spectrum is not None:
+                yield spectrum
+        pending = chunk[starts[-1]:].copy()
+
+    if pending is not None and len(pending) and pending[0, 0] / time_unit <= time_high:
+        spectrum = finish(pending)
+        if spectrum is not None:
+            yield spectrum
+
+
+def _first_fields(buffer):
+    """Start, field end and fixed-width bytes of the first field of every non-blank line."""
+    line_ends = np.flatnonzero(buffer == ord("\n"))
+    line_starts = np.concatenate([[0], line_ends[:-1] + 1])
+    # Skip blank lines (also a bare "\r" of Windows line endings)
+    filled = line_ends - line_starts > 1
+    line_starts, line_ends = line_starts[filled], line_ends[filled]
+
+    separators = np.flatnonzero((buffer == ord("\t")) | (buffer == ord(" ")))
+    separators = np.append(separators, len(buffer))
+    field_ends = np.minimum(separators[np.searchsorted(separators, line_starts)], line_ends)
+
+    # Copy the first bytes of every line through a sliding-window view, blank
+    # out what follows the field, and compare 8 bytes at a time
+    padded = np.concatenate([buffer, np.zeros(_FIELD_WIDTH, dtype=np.uint8)])
+    fields = np.lib.stride_tricks.sliding_window_view(padded, _FIELD_WIDTH)[line_starts].view(np.uint64)
+    lengths = np.minimum(field_ends - line_starts, _FIELD_WIDTH)
+    fields &= _FIELD_MASKS[lengths]
+    return line_starts, field_ends, fields
+
+
+def scan_spectra(file_path, skiprows=1, block_size=_SCAN_BYTES):
+    """Scan an export and return ``(offsets, rows, times)`` of every spectrum.
+
+    ``offsets`` and ``rows`` have one extra entry for the end of the data
+    (file size and total number of rows). Spectra are runs of consecutive
+    rows with the same Time text, as the spectrometer writes them. The file
+    is read in blocks and every block is scanned with array operations.
+    """
+    offsets, rows, times = [], [], []
+    previous_field = None
+    n_rows = 0
+    with open(file_path, "rb") as f:
+        for _ in range(skiprows):
+            f.readline()
+        position = f.tell()
+        carry = b""
+        while True:
+            block = f.read(block_size)
+            data = carry + block
+            if not block:
+                # A last line without a newline
+                if not data.strip():
+                    break
+                data += b"\n"
+            end = data.rfind(b"\n") + 1
+            carry = data[end:]
+            buffer = np.frombuffer(data, dtype=np.uint8, count=end)
+            line_starts, field_ends, fields = _first_fields(buffer)
+
+            changed = np.ones(len(fields), dtype=bool)
+            changed[1:] = np.any(fields[1:] != fields[:-1], axis=1)
+            if previous_field is not None and len(fields):
+                changed[0] = np.any(fields[0] != previous_field)
+            for line in np.flatnonzero(changed):
+                offsets.append(position + line_starts[line])
+                rows.append(n_rows + line)
+                times.append(float(data[line_starts[line]:field_ends[line]]))
+
+            if len(fields):
+                previous_field = fields[-1]
+            n_rows += len(fields)
+            position += end
+            if not block:
+                break
+    offsets.append(position)
+    rows.append(n_rows)
+    return np.array(offsets, dtype=np.int64), np.array(rows, dtype=np.int64), np.array(times)
+
+
+def stream_to_grid(file_path, shift_range=None, time_range=None, time_unit=1.0,
+                   missing=0.0, chunk_rows=8192, skiprows=1):
+    """Build ``(unique_times, unique_shifts, intensity_matrix)`` from a stream.
+
+    Same result as loading the file, masking and calling ``pivot_to_grid``,
+    but the text is read with ``iter_spectra`` so the full file never sits in
+    memory. A byte scan (``scan_spectra``, no parsing of the numbers) first
+    gives the times of the spectra, so the grid is allocated once at its
+    final number of rows and filled as the spectra arrive: peak memory is
+    the grid plus one chunk of ``chunk_rows`` text rows (a few spectra),
+    whatever the size of the file. Only a spectrum with shifts the earlier
+    ones lack makes the grid wider, through one copy.
+    """
+    _, _, times = scan_spectra(file_path, skiprows)
+    times = times / time_unit
+    if time_range is not None:
+        # iter_spectra stops at the first spectrum past the range
+        past = np.flatnonzero(times > time_range[1])
+        times = times[:past[0] if len(past) else len(times)]
+        times = times[times >= time_range[0]]
+    unique_times = np.unique(times)
+
+    unique_shifts = None
+    intensity_matrix = None
+    for t, shift, intensity in iter_spectra(file_path, shift_range, time_range,
+                                            time_unit, chunk_rows, skiprows):
+        if unique_shifts is None:
+            unique_shifts = np.unique(shift)
+            intensity_matrix = np.full((len(unique_times), len(unique_shifts)), missing, dtype=float)
+        columns = np.searchsorted(unique_shifts, shift)
+        known = columns < len(unique_shifts)
+        if not (known.all() and np.array_equal(unique_shifts[columns[known]], shift)):
+            # New shift values: widen the grid, existing columns keep their data
+            widened = np.union1d(unique_shifts, shift)
+            matrix = np.full((len(unique_times), len(widened)), missing, dtype=float)
+            matrix[:, np.searchsorted(widened, unique_shifts)] = intensity_matrix
+            unique_shifts, intensity_matrix = widened, matrix
+            columns = np.searchsorted(unique_shifts, shift)
+        # A time repeated later in the file fills the same row
+        intensity_matrix[np.searchsorted(unique_times, t), columns] = intensity
+
+    if intensity_matrix is None:
+        return np.empty(0), np.empty(0), np.empty((0, 0))
+    return unique_times, unique_shifts, intensity_matrix
+
+
+class TailReader:
+    """Read only the rows appended to an export since the previous call.
+
+    Remembers the byte offset reached so far; every ``read_new`` parses the
+    complete lines written after it (a half-written last line is left for
+    the next call). If the file shrinks it was restarted or rewritten: the
+    reader starts again from the top and ``restarts`` is incremented.
+    """
+
+    def __init__(self, file_path, skiprows=1):
+        self.file_path = file_path
+        self.skiprows = skiprows
+        self.offset = 0
+        self.restarts = 0
+        self._header_left = skiprows
+
+    def read_new(self):
+        """Return the new rows as a 2D float array (no rows: shape ``(0, 0)``)."""
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            self.offset = 0
+            self._header_left = self.skiprows
+            self.restarts += 1
+        if size == self.offset:
+            return np.empty((0, 0))
+
+        with open(self.file_path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return np.empty((0, 0))
+        self.offset += end
+
+        lines = data[:end].decode("utf-8").splitlines()
+        if self._header_left:
+            skipped = min(self._header_left, len(lines))
+            lines = lines[skipped:]
+            self._header_left -= skipped
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return np.empty((0, 0))
+        return np.loadtxt(lines, ndmin=2)
@@ -0,0 +1,256 @@
+import matplotlib
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+
+from raman_grid import decimate_surface, downsample_grid
+
+# Drawing helpers shared by the plotting scripts.
+
+CYCLE_COLORS = {"charge": "red", "discharge": "blue"}
+
+RENDER_MODES = ("contour", "raster")
+
+TRACE_AXES = ("time", "potential")
+
+
+def add_cycle_overlays(ax, cycles, x=None, labels=True):
+    """Draw charge/discharge boundaries and labels from a cycle table.
+
+    Every segment gets a dashed horizontal line where it starts (red for
+    charge, blue for discharge) and, with ``labels``, its name at the middle
+    of the segment. ``x`` is where the labels go, by default the middle of
+    the current x limits. ``cycles`` is a ``potential.CYCLE_DTYPE`` table.
+    Returns the drawn artists.
+    """
+    if x is None:
+        x = np.mean(ax.get_xlim())
+    artists = []
+    for segment in cycles:
+        kind = str(segment["kind"])
+        color = CYCLE_COLORS.get(kind, "gray")
+        artists.append(ax.axhline(y=segment["start_time"], color=color, linestyle='--', linewidth=1))
+        if labels and segment["end_time"] > segment["start_time"]:
+            midpoint = (segment["start_time"] + segment["end_time"]) / 2
+            artists.append(ax.text(
+                x=x, y=midpoint,
+                s=kind.capitalize(), color=color, ha='center', va='center', fontsize=12, weight='bold'
+            ))
+    return artists
+
+
+def plot_contour_map(ax, unique_shifts, unique_times, intensity_matrix, levels=100, cmap="plasma",
+                     title="Operando Raman Contour Map", time_limits=None, invert_time=True, colorbar=True,
+                     render="contour"):
+    """Filled contour map of a (time x shift) grid in the style of the scripts.
+
+    Returns the contour set (or image). ``time_limits`` is passed to ``set_ylim``;
+    the time axis is then inverted so time runs downwards like in the saved figures.
+    ``render="raster"`` draws the grid with ``draw_raster`` instead of
+    ``contourf``, which stays fast for thousands of spectra.
+    """
+    if render == "contour":
+        contour = ax.contourf(unique_shifts, unique_times, intensity_matrix, levels=levels, cmap=cmap)
+    elif render == "raster":
+        contour = draw_raster(ax, unique_shifts, unique_times, intensity_matrix, cmap=cmap)
+    else:
+        raise ValueError(f"render must be one of {RENDER_MODES}, got {render!r}")
+    if time_limits is not None:
+        ax.set_ylim(time_limits)
+    if invert_time:
+        ax.invert_yaxis()
+    if colorbar:
+        cbar = ax.figure.colorbar(contour, ax=ax)
+        cbar.set_label("Intensity (a.u.)")
+    ax.set_xlabel("Raman Shift (cm⁻¹)")
+    ax.set_ylabel("Time (hours)")
+    ax.set_title(title)
+    return contour
+
+
+def plot_correlation_map(ax, unique_shifts, correlation, levels=100, cmap="plasma", title="Synchronous",
+                         colorbar=True, render="contour"):
+    """Filled contour map of a (shift x shift) 2D correlation map.
+
+    The color scale is symmetric around zero so positive and negative
+    cross peaks get the same weight; a diagonal line marks v1 = v2.
+    """
+    limit = np.nanmax(np.abs(correlation)) or 1.0
+    norm = matplotlib.colors.Normalize(-limit, limit)
+    if render == "contour":
+        contour = ax.contourf(unique_shifts, unique_shifts, correlation, cmap=cmap, norm=norm,
+                              levels=np.linspace(-limit, limit, levels))
+    elif render == "raster":
+        contour = draw_raster(ax, unique_shifts, unique_shifts, correlation, cmap=cmap, norm=norm)
+    else:
+        raise ValueError(f"render must be one of {RENDER_MODES}, got {render!r}")
+    ax.plot([unique_shifts[0], unique_shifts[-1]], [unique_shifts[0], unique_shifts[-1]],
+            color="white", linestyle="--", linewidth=0.8)
+    if colorbar:
+        cbar = ax.figure.colorbar(contour, ax=ax)
+        cbar.set_label("Correlation intensity (a.u.)")
+    ax.set_aspect("equal")
+    ax.set_xlabel("Raman Shift (cm⁻¹)")
+    ax.set_ylabel("Raman Shift (cm⁻¹)")
+    ax.set_title(title)
+    return contour
+
+
+def plot_waterfall_surface(ax, unique_shifts, unique_times, intensity_matrix, cmap="plasma",
+                           title="D and G band evolution", zlabel="Normalized Intensity",
+                           max_polygons=20000):
+    """3D surface of a (time x shift) grid on an axis made with ``projection='3d'``.
+
+    The grid is first reduced to ``max_polygons`` cells with ``decimate_surface``
+    (peak-preserving along shift, strided along time) and then drawn at full
+    resolution, instead of letting ``plot_surface`` stride blindly over every
+    cell. Use ``max_polygons=None`` to draw the whole grid.
+    """
+    if max_polygons is not None:
+        unique_times, unique_shifts, intensity_matrix = decimate_surface(
+            unique_times, unique_shifts, intensity_matrix, max_polygons=max_polygons
+        )
+    X, Y = np.meshgrid(unique_shifts, unique_times)
+    rows, cols = intensity_matrix.shape
+    surface = ax.plot_surface(X, Y, intensity_matrix, cmap=cmap, rcount=rows, ccount=cols)
+    ax.set_xlabel("Raman Shift (cm⁻¹)")
+    ax.set_ylabel("Time (hours)")
+    ax.set_zlabel(zlabel)
+    ax.set_title(title)
+    return surface
+
+
+def plot_waterfall_lines(ax, unique_shifts, unique_times, intensity_matrix, cmap="plasma", filled=False,
+                         title="D and G band evolution", zlabel="Normalized Intensity",
+                         max_lines=200, max_points=1000):
+    """True waterfall: one trace per spectrum, all drawn as a single collection.
+
+    The spectra are spread along the time axis of a ``projection='3d'`` axis
+    and coloured by time. With ``filled`` each trace is a polygon down to the
+    lowest intensity so later spectra hide earlier ones. The grid is first
+    decimated to ``max_lines`` spectra of at most ``max_points`` points each.
+    """
+    unique_times, unique_shifts, intensity_matrix = decimate_surface(
+        unique_times, unique_shifts, intensity_matrix, max_polygons=max_lines * max_points
+    )
+    if len(unique_times) > max_lines:
+        rows = np.unique(np.linspace(0, len(unique_times) - 1, max_lines).astype(int))
+        unique_times, intensity_matrix = unique_times[rows], intensity_matrix[rows]
+
+    shifts = np.broadcast_to(unique_shifts, intensity_matrix.shape)
+    colors = matplotlib.colormaps[cmap](np.linspace(0, 1, len(unique_times)))
+    if filled:
+        floor = np.nanmin(intensity_matrix)
+        outline = np.stack([shifts, intensity_matrix], axis=2)
+        ends = np.array([[[unique_shifts[-1], floor], [unique_shifts[0], floor]]])
+        polygons = np.concatenate([outline, np.repeat(ends, len(unique_times), axis=0)], axis=1)
+        collection = PolyCollection(polygons, facecolors=colors, edgecolors="black", linewidths=0.3)
+    else:
+        collection = LineCollection(np.stack([shifts, intensity_matrix], axis=2), colors=colors, linewidths=0.8)
+    ax.add_collection3d(collection, zs=unique_times, zdir="y")
+
+    ax.set_xlim(unique_shifts[0], unique_shifts[-1])
+    ax.set_ylim(unique_times[0], unique_times[-1])
+    ax.set_zlim(np.nanmin(intensity_matrix), np.nanmax(intensity_matrix))
+    ax.set_xlabel("Raman Shift (cm⁻¹)")
+    ax.set_ylabel("Time (hours)")
+    ax.set_zlabel(zlabel)
+    ax.set_title(title)
+    return collection
+
+
+def plot_component_scores(ax, unique_times, scores, cycles=None, names=None):
+    """Time-resolved component scores, time on the y axis like the maps.
+
+    One line per column of ``scores`` (from ``decomposition``), so the axis
+    can share its y axis with a contour map; ``cycles`` adds the
+    charge/discharge boundaries of ``add_cycle_overlays``.
+    """
+    names = names or [f"Component {k + 1}" for k in range(scores.shape[1])]
+    lines = ax.plot(scores, unique_times)
+    for line, name in zip(lines, names):
+        line.set_label(name)
+    if len(unique_times):
+        ax.set_ylim(unique_times[-1], unique_times[0])
+    if cycles is not None:
+        add_cycle_overlays(ax, cycles, labels=False)
+    ax.set_xlabel("Score")
+    ax.set_ylabel("Time (hours)")
+    ax.legend(loc="best", fontsize=8)
+    return lines
+
+
+def plot_band_traces(ax, unique_times, traces, labels, potential=None, against="time", cycles=None,
+                     ylabel="Integrated intensity (a.u.)"):
+    """Window traces (spectra x windows, e.g. from ``band_integrals``) over time or potential.
+
+    against="time" draws the traces over time with ``potential`` (one value
+    per spectrum) on a second y axis in green; against="potential" draws
+    them over the potential itself. ``cycles`` adds the charge/discharge
+    boundaries as vertical lines on the time axis. Returns the trace lines.
+    """
+    if against not in TRACE_AXES:
+        raise ValueError(f"against must be one of {TRACE_AXES}, got {against!r}")
+    if against == "potential":
+        if potential is None:
+            raise ValueError("against='potential' needs the potential of every spectrum")
+        lines = ax.plot(potential, traces)
+        ax.set_xlabel("Potential (V)")
+    else:
+        lines = ax.plot(unique_times, traces)
+        ax.set_xlabel("Time (hours)")
+        if cycles is not None and len(unique_times):
+            # Only the boundaries inside the recorded span, so the time axis keeps its range
+            inside = (cycles["start_time"] >= np.min(unique_times)) & (cycles["start_time"] <= np.max(unique_times))
+            for segment in cycles[inside]:
+                ax.axvline(x=segment["start_time"], color=CYCLE_COLORS.get(str(segment["kind"]), "gray"),
+                           linestyle='--', linewidth=1)
+        if potential is not None:
+            twin = ax.twinx()
+            twin.plot(unique_times, potential, color="green", linewidth=1)
+            twin.set_ylabel("Potential (V)", color="green")
+    for line, label in zip(lines, labels):
+        line.set_label(label)
+    ax.set_ylabel(ylabel)
+    ax.legend(loc="best", fontsize=8)
+    return lines
+
+
+def axis_pixels(ax):
+    """Size of an axes in display pixels, ``(width, height)``."""
+    bbox = ax.get_window_extent()
+    return max(int(bbox.width), 1), max(int(bbox.height), 1)
+
+
+def _cell_edges(centers):
+    centers = np.asarray(centers, dtype=float)
+    if len(centers) == 1:
+        return np.array([centers[0] - 0.5, centers[0] + 0.5])
+    middle = (centers[:-1] + centers[1:]) / 2
+    return np.concatenate([[2 * centers[0] - middle[0]], middle, [2 * centers[-1] - middle[-1]]])
+
+
+def _is_uniform(centers):
+    steps = np.diff(centers)
+    return len(steps) == 0 or np.allclose(steps, steps[0], rtol=1e-3, atol=0)
+
+
+def draw_raster(ax, unique_shifts, unique_times, intensity_matrix, cmap="plasma", downsample=True, norm=None):
+    """Draw a (time x shift) grid as an image instead of contour paths.
+
+    With ``downsample`` the grid is first averaged down to the pixel size of
+    the axes, so the cost no longer depends on the number of spectra. Evenly
+    spaced axes use ``imshow``; uneven ones a ``pcolormesh`` with cell edges
+    halfway between neighbouring values. ``norm`` (a matplotlib ``Normalize``)
+    lets several rasters share one color scale.
+    """
+    if downsample:
+        width, height = axis_pixels(ax)
+        unique_times, unique_shifts, intensity_matrix = downsample_grid(
+            unique_times, unique_shifts, intensity_matrix, max_rows=height, max_cols=width
+        )
+    x_edges = _cell_edges(unique_shifts)
+    y_edges = _cell_edges(unique_times)
+    if _is_uniform(unique_shifts) and _is_uniform(unique_times):
+        return ax.imshow(intensity_matrix, cmap=cmap, origin="lower", aspect="auto", interpolation="nearest",
+                         extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]), norm=norm)
+    return ax.pcolormesh(x_edges, y_edges, intensity_matrix, cmap=cmap, shading="flat", norm=norm)
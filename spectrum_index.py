@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from raman_io import _read_meta, _source_stamp, _write_meta, cache_paths, scan_spectra
+
+# Byte-offset index of the spectra in a Time / Ramanshift / Intensity export,
+# and parallel parsing of just the spectra inside a time range:
+#
+#     data = read_time_range("LHCE3.txt", (0, 18), time_unit=3600)
+#
+# The index stores, for every spectrum, the byte offset and row number where
+# it starts and its Time value. It is built once with the vectorized byte
+# scan of raman_io (``scan_spectra``) and kept next to its binary cache.
+
+_SCAN_BYTES = 1 << 24
+
+# Selections smaller than this are parsed in the calling process, a pool
+# would cost more to start than it saves
+_POOL_MIN_BYTES = 1 << 25
+
+def spectrum_index(file_path, skiprows=1, cache_dir=None, block_size=_SCAN_BYTES):
+    """``(offsets, rows, times)`` of ``scan_spectra``, stored in a sidecar file.
+
+    The sidecar is rebuilt whenever the size or mtime of the export changed.
+    A smaller ``block_size`` makes the scan use less memory.
+    """
+    npy_path, _ = cache_paths(file_path, cache_dir)
+    index_path = npy_path[:-len(".npy")] + ".index.npz"
+    meta_path = index_path + ".json"
+    stamp = _source_stamp(file_path)
+    meta = _read_meta(meta_path)
+    if meta is not None and meta.get("skiprows") == skiprows and all(meta.get(k) == v for k, v in stamp.items()):
+        try:
+            with np.load(index_path) as stored:
+                return stored["offsets"], stored["rows"], stored["times"]
+        except (OSError, KeyError, ValueError):
+            pass
+
+    offsets, rows, times = scan_spectra(file_path, skiprows, block_size)
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        np.savez(index_path, offsets=offsets, rows=rows, times=times)
+        _write_meta(meta_path, dict(stamp, skiprows=skiprows))
+    except OSError:
+        pass
+    return offsets, rows, times
+
+
+def _read_bytes(file_path, start, end):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _parse_block(file_path, byte_start, byte_end, n_columns, out_name, out_shape, row_start):
+    """Parse one byte range into rows ``row_start:`` of a shared-memory array. Runs in a worker."""
+    # C-level tokenizer; " " as separator matches any run of whitespace
+    text = _read_bytes(file_path, byte_start, byte_end).decode("ascii")
+    values = np.fromstring(text, sep=" ").reshape(-1, n_columns)
+    memory = shared_memory.SharedMemory(name=out_name)
+    try:
+        np.ndarray(out_shape, dtype=float, buffer=memory.buf)[row_start:row_start + len(values)] = values
+    finally:
+        memory.close()
+    return len(values)
+
+
+def _merge_ranges(selected, offsets, rows):
+    # Consecutive selected spectra become one (byte_start, byte_end, row_count) range
+    ranges = []
+    for k in selected:
+        if ranges and ranges[-1][1] == offsets[k]:
+            start, _, count = ranges[-1]
+            ranges[-1] = (start, offsets[k + 1], count + rows[k + 1] - rows[k])
+        else:
+            ranges.append((offsets[k], offsets[k + 1], rows[k + 1] - rows[k]))
+    return ranges
+
+
+def _split_ranges(ranges, offsets, rows, n_parts):
+    # Cut the ranges at spectrum boundaries into about n_parts blocks of equal bytes
+    total = sum(end - start for start, end, _ in ranges)
+    target = max(total // max(n_parts, 1), 1)
+    blocks = []
+    for start, end, _ in ranges:
+        first = np.searchsorted(offsets, start)
+        last = np.searchsorted(offsets, end)
+        cuts = offsets[first:last + 1]
+        inner = np.searchsorted(cuts - start, np.arange(target, end - start, target))
+        marks = np.unique(np.concatenate([[0], inner, [len(cuts) - 1]]))
+        for a, b in zip(marks[:-1], marks[1:]):
+            blocks.append((cuts[a], cuts[b], rows[first + b] - rows[first + a]))
+    return blocks
+
+
+def read_time_range(file_path, time_range=None, time_unit=1.0, workers=None, skiprows=1, pad=0, cache_dir=None):
+    """Parse only the spectra of an export whose time is inside ``time_range``.
+
+    time_range -- (low, high), inclusive, in ``time_unit`` (3600: hours); None reads all
+    pad        -- extra spectra kept on each side of the range, e.g. as neighbours
+                  for interpolating up to its edges; 0 returns exactly the range
+    workers    -- parsing processes (None: all cores, 1: in this process);
+                  selections under 32 MB are always parsed in this process.
+                  A pool re-imports the calling script on Windows and macOS,
+                  so scripts that use one need an ``if __name__ == "__main__":`` guard
+
+    The index (``spectrum_index``) locates the byte ranges to read; they are
+    split at spectrum boundaries over the workers, which write straight into
+    one shared-memory array. Returns the rows like ``np.loadtxt`` would, in
+    file order.
+    """
+    offsets, rows, times = spectrum_index(file_path, skiprows, cache_dir)
+    n_spectra = len(times)
+    if time_range is None:
+        selected = np.arange(n_spectra)
+    else:
+        scaled = times / time_unit
+        inside = (scaled >= time_range[0]) & (scaled <= time_range[1])
+        # Neighbours in time, not in file order, in case a spectrum is out of place
+        order = np.argsort(scaled, kind="stable")
+        ranked = np.flatnonzero(inside[order])
+        if len(ranked):
+            ranked = np.arange(max(ranked[0] - pad, 0), min(ranked[-1] + pad, n_spectra - 1) + 1)
+        selected = np.sort(order[ranked])
+
+    ranges = _merge_ranges(selected, offsets, rows)
+    n_rows = sum(count for _, _, count in ranges)
+    if n_rows == 0:
+        return np.empty((0, 3))
+    with open(file_path, "rb") as f:
+        f.seek(ranges[0][0])
+        n_columns = len(f.readline().split())
+
+    if workers == 1 or sum(end - start for start, end, _ in ranges) < _POOL_MIN_BYTES:
+        parts = [np.fromstring(_read_bytes(file_path, start, end).decode("ascii"), sep=" ")
+                 for start, end, _ in ranges]
+        return np.concatenate(parts).reshape(-1, n_columns)
+
+    n_workers = workers or os.cpu_count() or 1
+    blocks = _split_ranges(ranges, offsets, rows, n_workers * 4)
+    shape = (n_rows, n_columns)
+    memory = shared_memory.SharedMemory(create=True, size=max(n_rows * n_columns * 8, 1))
+    try:
+        row_starts = np.concatenate([[0], np.cumsum([count for _, _, count in blocks])[:-1]])
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            parsed = list(pool.map(_parse_block, *zip(*[
+                (file_path, start, end, n_columns, memory.name, shape, row_start)
+                for (start, end, _), row_start in zip(blocks, row_starts)
+            ])))
+        if sum(parsed) != n_rows:
+            raise ValueError(f"{file_path}: index is out of date or a row has a missing value")
+        data = np.array(np.ndarray(shape, dtype=float, buffer=memory.buf))
+    finally:
+        memory.close()
+        memory.unlink()
+    return data
@@ -0,0 +1,182 @@
+"""Generate synthetic operando exports in the spectrometer's text formats.
+
+Example (100 000 spectra every 10 s with the matching potential file):
+
+    python synthetic.py big.txt --spectra 100000 --interval 10 --potential big_potential.txt
+
+The Raman file has the layout of ECDEC-charge-discharge.txt: a
+"Time\\t\\tRamanshift\\tIntensity" header, then one tab-separated row per
+point, time in seconds, shifts descending. The potential file follows
+potential_data_LHCE3.txt: time in hours and potential in volts in
+scientific notation with three-digit exponents.
+
+Both follow the same cycling state of charge: the potential runs between
+the cut-off voltages, while the D, G and low-wavenumber bands shift and
+fade as the electrode is lithiated. Spectra and potential rows are written
+in chunks, so the size of the output is not limited by memory.
+"""
+import argparse
+import re
+
+import numpy as np
+
+# (center, FWHM, height) of the bands at full charge, in cm⁻¹ / a.u.
+BANDS = {
+    "low": (250.0, 90.0, 0.25),
+    "sharp": (417.0, 4.0, 0.35),
+    "D": (1320.0, 60.0, 0.6),
+    "G": (1582.0, 30.0, 1.0),
+}
+
+RAMAN_HEADER = "Time\t\tRamanshift\tIntensity\n"
+POTENTIAL_HEADER = "Time                Potential\n"
+
+_EXPONENT = re.compile(r"E([+-])(\d\d)\b")
+
+
+def state_of_charge(time_hours, half_cycle=18.0):
+    """Triangular state of charge: 1 at the start, 0 after each discharge of ``half_cycle`` hours."""
+    phase = np.mod(np.asarray(time_hours, dtype=float) / half_cycle, 2.0)
+    return np.abs(1.0 - phase)
+
+
+def potential_profile(time_hours, half_cycle=18.0, v_low=0.01, v_high=3.0, noise=0.0005, rng=None):
+    """Cell potential in volts for a discharge-first galvanostatic cycling.
+
+    Steep at high state of charge and flat near the lower cut-off like a
+    graphite anode, with a small overpotential between discharge and charge.
+    """
+    time_hours = np.asarray(time_hours, dtype=float)
+    soc = state_of_charge(time_hours, half_cycle)
+    charging = np.mod(time_hours / half_cycle, 2.0) >= 1.0
+    potential = v_low + (v_high - v_low) * (0.12 * soc + 0.88 * soc ** 12)
+    potential += np.where(charging, 0.03, -0.03) * (v_high - v_low) * np.sqrt(soc * (1 - soc))
+    if noise and rng is not None:
+        potential += rng.normal(0.0, noise, potential.shape)
+    return np.clip(potential, v_low, v_high)
+
+
+def shift_axis(n_shifts, shift_range=(100.0, 2000.0), laser_nm=532.0):
+    """Descending Raman shift axis of a grating spectrometer.
+
+    The pixels are evenly spaced in wavelength, so the spacing in cm⁻¹ drifts
+    slightly along the axis like in the real exports.
+    """
+    laser = 1e7 / laser_nm
+    wavelengths = np.linspace(1e7 / (laser - shift_range[0]), 1e7 / (laser - shift_range[1]), n_shifts)
+    return (laser - 1e7 / wavelengths)[::-1]
+
+
+def synthetic_spectra(time_hours, shifts, half_cycle=18.0, noise=0.01, spike_rate=0.0, rng=None):
+    """Intensity matrix (len(time_hours) x len(shifts)) of the cycling electrode.
+
+    ``shifts`` is one axis for all spectra or one row per spectrum. While the
+    state of charge drops the G band softens and broadens, D grows relative
+    to G and the whole signal fades. ``spike_rate`` is the mean number of
+    one- or two-pixel cosmic rays per spectrum.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    soc = state_of_charge(time_hours, half_cycle)[:, None]
+    shifts = np.broadcast_to(shifts, (len(soc), np.shape(shifts)[-1]))
+
+    intensity = 0.05 + 0.04 * (shifts / 2000.0)
+    for name, (center, fwhm, height) in BANDS.items():
+        if name == "G":
+            center = center + 18.0 * (1 - soc)
+            fwhm = fwhm * (1 + 0.8 * (1 - soc))
+        elif name == "D":
+            height = height * (1 + 0.5 * (1 - soc))
+        intensity = intensity + height / (1 + ((shifts - center) / (fwhm / 2)) ** 2)
+    intensity *= 0.3 + 0.7 * soc
+    if noise:
+        intensity += rng.normal(0.0, noise, intensity.shape)
+
+    if spike_rate:
+        counts = rng.poisson(spike_rate, len(soc))
+        rows = np.repeat(np.arange(len(soc)), counts)
+        columns = rng.integers(0, shifts.shape[1] - 1, len(rows))
+        heights = rng.uniform(2.0, 10.0, len(rows))
+        intensity[rows, columns] += heights
+        wide = rng.random(len(rows)) < 0.5
+        intensity[rows[wide], columns[wide] + 1] += heights[wide] / 2
+    return intensity
+
+
+def _format_rows(rows, row_format):
+    return (row_format * len(rows)) % tuple(rows.ravel())
+
+
+def write_raman_export(file_path, n_spectra, n_shifts=1700, interval=2040.0, shift_range=(100.0, 2000.0),
+                       half_cycle=18.0, jitter=0.0, noise=0.01, spike_rate=0.0, seed=0, chunk_spectra=256):
+    """Stream a Time / Ramanshift / Intensity export of ``n_spectra`` spectra to disk.
+
+    interval -- seconds between spectra; each time gets up to one second
+                (at most a quarter of ``interval``) of scatter and, from 4 s
+                up, is rounded to whole seconds as recorded, so times always
+                increase
+    jitter   -- standard deviation in cm⁻¹ of a per-spectrum offset of the
+                shift axis; 0 gives every spectrum the same axis like the
+                bundled exports
+    """
+    rng = np.random.default_rng(seed)
+    shifts = shift_axis(n_shifts, shift_range)
+    # Neighbouring times stay at least interval / 2 apart before rounding,
+    # which then moves each by at most half a second
+    scatter = min(1.0, interval / 4)
+    with open(file_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(RAMAN_HEADER)
+        for start in range(0, n_spectra, chunk_spectra):
+            index = np.arange(start, min(start + chunk_spectra, n_spectra))
+            times = np.maximum(index * interval + rng.uniform(-scatter, scatter, len(index)), 0.0)
+            if interval >= 4:
+                times = np.round(times)
+            times[index == 0] = 0.0
+            axes = shifts + rng.normal(0.0, jitter, (len(index), 1)) if jitter else shifts
+            intensity = synthetic_spectra(times / 3600, axes, half_cycle, noise, spike_rate, rng)
+            rows = np.column_stack([
+                np.repeat(times, n_shifts),
+                np.broadcast_to(axes, intensity.shape).ravel(),
+                intensity.ravel(),
+            ])
+            f.write(_format_rows(rows, "%.6f\t%.6f\t%.6f\n"))
+
+
+def write_potential_export(file_path, duration_hours, step_seconds=1.0, half_cycle=18.0,
+                           v_low=0.01, v_high=3.0, noise=0.0005, seed=0, chunk_rows=1 << 16):
+    """Stream a Time (hours) / Potential (V) export sampled every ``step_seconds``."""
+    rng = np.random.default_rng(seed)
+    n_rows = int(duration_hours * 3600 / step_seconds) + 1
+    with open(file_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(POTENTIAL_HEADER)
+        for start in range(0, n_rows, chunk_rows):
+            time_hours = np.arange(start, min(start + chunk_rows, n_rows)) * step_seconds / 3600
+            potential = potential_profile(time_hours, half_cycle, v_low, v_high, noise, rng)
+            text = _format_rows(np.column_stack([time_hours, potential]), "%.15E\t%.15E\n")
+            f.write(_EXPONENT.sub(r"E\g<1>0\2", text))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic operando Raman / potential exports.")
+    parser.add_argument("file_path", help="Raman export to write")
+    parser.add_argument("--spectra", type=int, default=1000)
+    parser.add_argument("--shifts", type=int, default=1700, help="points per spectrum")
+    parser.add_argument("--interval", type=float, default=2040.0, help="seconds between spectra")
+    parser.add_argument("--shift-range", nargs=2, type=float, default=(100.0, 2000.0), metavar=("LOW", "HIGH"))
+    parser.add_argument("--half-cycle", type=float, default=18.0, help="hours per discharge or charge")
+    parser.add_argument("--jitter", type=float, default=0.0, help="per-spectrum shift axis offset (cm⁻¹ sd)")
+    parser.add_argument("--noise", type=float, default=0.01)
+    parser.add_argument("--spike-rate", type=float, default=0.05, help="cosmic rays per spectrum")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--potential", help="also write the matching Time/Potential export here")
+    parser.add_argument("--potential-step", type=float, default=1.0, help="seconds between potential rows")
+    args = parser.parse_args(argv)
+
+    write_raman_export(args.file_path, args.spectra, args.shifts, args.interval, args.shift_range,
+                       args.half_cycle, args.jitter, args.noise, args.spike_rate, args.seed)
+    if args.potential:
+        duration = (args.spectra - 1) * args.interval / 3600
+        write_potential_export(args.potential, duration, args.potential_step, args.half_cycle, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
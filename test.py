@@ -1,9 +1,19 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from band_integrals import BandIntegrals
+from potential import cycles_from_boundaries
+from raman_grid import extract_windows
+from spectrum_index import read_time_range
+from raman_plots import add_cycle_overlays, plot_band_traces
+
 # ---- STEP 1: Load Data ----
 file_path = r"C:\Users\StdUser\PycharmProjects\PythonProject\LHCE3.txt"
-data = np.loadtxt(file_path, skiprows=1)
+# The plots start at hour 18, so only the spectra from there on are parsed,
+# the spectrum offset index next to the file tells where they are. workers=1
+# parses in this process: a worker pool needs an ``if __name__ == "__main__":``
+# guard on Windows
+data = read_time_range(file_path, time_range=(18, np.inf), time_unit=3600, workers=1)
 
 # Extract columns
 time = data[:, 0]         # First column → Time (in seconds)
@@ -13,30 +23,14 @@ intensity = data[:, 2]    # Third column → Intensity (Z-axis)
 # ---- STEP 2: Convert Time to Hours ----
 time_in_hours = time / 3600  # Convert time from seconds to hours
 
-# ---- STEP 3: Filter Data for Raman Shift Between 1000 and 1750 cm⁻¹ ----
-mask = (raman_shift >= 1000) & (raman_shift <= 1750)
-filtered_data = data[mask]
-
-# Extract filtered columns
-time_filtered = filtered_data[:, 0] / 3600  # Convert filtered time to hours
-raman_shift_filtered = filtered_data[:, 1]
-intensity_filtered = filtered_data[:, 2]
-
-# ---- STEP 4: Reshape Data into 2D Grid (for filtered data) ----
-unique_times = np.unique(time_filtered)
-unique_shifts = np.unique(raman_shift_filtered)
-
-# Create a 2D intensity matrix (rows = time, columns = Raman shift)
-intensity_matrix = np.zeros((len(unique_times), len(unique_shifts)))
-
-# Fill the matrix by matching (time, Raman Shift) pairs
-for i, t in enumerate(unique_times):
-    for j, shift in enumerate(unique_shifts):
-        mask = (time_filtered == t) & (raman_shift_filtered == shift)
-        if np.any(mask):
-            intensity_matrix[i, j] = intensity_filtered[mask][0]
+# ---- STEP 3: Reshape Data into 2D Grids (1000-1750 and 150-300 cm⁻¹) ----
+# Both ranges are gridded in a single pass, the matrices are views into one
+# shared grid (rows = time, columns = Raman shift)
+unique_times, windows = extract_windows(time_in_hours, raman_shift, intensity, [(1000, 1750), (150, 300)])
+(unique_shifts, intensity_matrix), (unique_shifts_150_300, intensity_matrix_150_300) = windows
+unique_times_150_300 = unique_times
 
-# ---- STEP 5: Create Contour Plot ----
+# ---- STEP 4: Create Contour Plot ----
 plt.figure(figsize=(8, 6))
 
 # Generate contour plot
@@ -55,62 +49,20 @@ cbar.set_label("Intensity (a.u.)")
 plt.xlabel("Raman Shift (cm⁻¹)")
 plt.ylabel("Time (hours)")  # Update label to 'Time (hours)'
 plt.title("Operando Raman Contour Map (1000-1750 cm⁻¹)")
-# ---- STEP 6: Add Alternating Dashed Lines ----
+# ---- STEP 5: Add Alternating Dashed Lines ----
 # Define times where you want to add dashed lines (e.g., 18.5h, 19h, etc.)
 charge_times = [19, 36.84, 55.64, 74.77 ]  # Example charge times
 discharge_times = [27.04, 45.82, 64.9, 83.97]  # Example discharge times
 
-# Add dashed lines for charge (red)
-for time_point in charge_times:
-    plt.axhline(y=time_point, color='red', linestyle='--', linewidth=1)  # Red dashed line for charge
-
-# Add dashed lines for discharge (blue)
-for time_point in discharge_times:
-    plt.axhline(y=time_point, color='blue', linestyle='--', linewidth=1)  # Blue dashed line for discharge
-# ---- STEP 7: Add Labels Between Lines ----
-# Loop over both charge and discharge times
-for i in range(min(len(charge_times), len(discharge_times))):
-    charge_time = charge_times[i]
-    discharge_time = discharge_times[i]
-
-    # Ensure that we place 'Charge' label between the charge and discharge lines
-    if charge_time < discharge_time:
-        midpoint = (charge_time + discharge_time) / 2
-        plt.text(
-            x=unique_shifts[len(unique_shifts) // 2], y=midpoint,
-            s="Charge", color='red', ha='center', va='center', fontsize=12, weight='bold'
-        )
-        # Also ensure we place 'Discharge' label on the opposite side
-        midpoint_next = (discharge_time + charge_times[i + 1]) / 2 if i + 1 < len(charge_times) else discharge_time
-        plt.text(
-            x=unique_shifts[len(unique_shifts) // 2], y=midpoint_next,
-            s="Discharge", color='blue', ha='center', va='center', fontsize=12, weight='bold'
-        )
-
-# ---- STEP 1: Filter Data for Raman Shift Between 150 and 300 cm⁻¹ ----
-mask_150_300 = (raman_shift >= 150) & (raman_shift <= 300)
-filtered_data_150_300 = data[mask_150_300]
-
-# Extract filtered columns for the second plot
-time_filtered_150_300 = filtered_data_150_300[:, 0] / 3600  # Convert filtered time to hours
-raman_shift_filtered_150_300 = filtered_data_150_300[:, 1]
-intensity_filtered_150_300 = filtered_data_150_300[:, 2]
-
-# ---- STEP 2: Reshape Data into 2D Grid (for second plot) ----
-unique_times_150_300 = np.unique(time_filtered_150_300)
-unique_shifts_150_300 = np.unique(raman_shift_filtered_150_300)
-
-# Create a 2D intensity matrix (rows = time, columns = Raman shift)
-intensity_matrix_150_300 = np.zeros((len(unique_times_150_300), len(unique_shifts_150_300)))
-
-# Fill the matrix by matching (time, Raman Shift) pairs
-for i, t in enumerate(unique_times_150_300):
-    for j, shift in enumerate(unique_shifts_150_300):
-        mask = (time_filtered_150_300 == t) & (raman_shift_filtered_150_300 == shift)
-        if np.any(mask):
-            intensity_matrix_150_300[i, j] = intensity_filtered_150_300[mask][0]
-
-# ---- STEP 3: Create Contour Plot for the second plot ----
+# Segments between the boundaries; with a potential file covering this run they
+# can be detected instead: cycles = detect_cycles_in_file(potential_file_path)
+cycles = cycles_from_boundaries(charge_times, discharge_times, end_time=max(unique_times))
+
+# ---- STEP 6: Add Dashed Lines and Labels Between Lines ----
+# Red dashed line where a charge starts, blue where a discharge starts
+add_cycle_overlays(plt.gca(), cycles, x=unique_shifts[len(unique_shifts) // 2])
+
+# ---- STEP 7: Create Side-by-Side Contour Plots ----
 plt.figure(figsize=(16, 6))  # Adjust size to fit both plots side by side
 
 # First plot (with the original Raman shift range)
@@ -124,27 +76,8 @@ plt.xlabel("Raman Shift (cm⁻¹)")
 plt.ylabel("Time (hours)")
 plt.title("Operando Raman Contour Map (1000-1750 cm⁻¹)")
 
-# Add dashed lines for charge and discharge times (first plot)
-for time_point in charge_times:
-    plt.axhline(y=time_point, color='red', linestyle='--', linewidth=1)
-for time_point in discharge_times:
-    plt.axhline(y=time_point, color='blue', linestyle='--', linewidth=1)
-
-# Add labels for Charge and Discharge
-for i in range(min(len(charge_times), len(discharge_times))):
-    charge_time = charge_times[i]
-    discharge_time = discharge_times[i]
-    if charge_time < discharge_time:
-        midpoint = (charge_time + discharge_time) / 2
-        plt.text(
-            x=unique_shifts[len(unique_shifts) // 2], y=midpoint,
-            s="Charge", color='red', ha='center', va='center', fontsize=12, weight='bold'
-        )
-        midpoint_next = (discharge_time + charge_times[i + 1]) / 2 if i + 1 < len(charge_times) else discharge_time
-        plt.text(
-            x=unique_shifts[len(unique_shifts) // 2], y=midpoint_next,
-            s="Discharge", color='blue', ha='center', va='center', fontsize=12, weight='bold'
-        )
+# Add dashed lines and labels for charge and discharge (first plot)
+add_cycle_overlays(plt.gca(), cycles, x=unique_shifts[len(unique_shifts) // 2])
 
 # Second plot (with the truncated Raman shift range)
 plt.subplot(1, 2, 2)  # Create the second subplot
@@ -157,28 +90,20 @@ plt.xlabel("Raman Shift (cm⁻¹)")
 plt.ylabel("Time (hours)")
 plt.title("Operando Raman Contour Map (150-300 cm⁻¹)")
 
-# Add dashed lines for charge and discharge times (second plot)
-for time_point in charge_times:
-    plt.axhline(y=time_point, color='red', linestyle='--', linewidth=1)
-for time_point in discharge_times:
-    plt.axhline(y=time_point, color='blue', linestyle='--', linewidth=1)
-
-# Add labels for Charge and Discharge in the second plot
-for i in range(min(len(charge_times), len(discharge_times))):
-    charge_time = charge_times[i]
-    discharge_time = discharge_times[i]
-    if charge_time < discharge_time:
-        midpoint = (charge_time + discharge_time) / 2
-        plt.text(
-            x=unique_shifts_150_300[len(unique_shifts_150_300) // 2], y=midpoint,
-            s="Charge", color='red', ha='center', va='center', fontsize=12, weight='bold'
-        )
-        midpoint_next = (discharge_time + charge_times[i + 1]) / 2 if i + 1 < len(charge_times) else discharge_time
-        plt.text(
-            x=unique_shifts_150_300[len(unique_shifts_150_300) // 2], y=midpoint_next,
-            s="Discharge", color='blue', ha='center', va='center', fontsize=12, weight='bold'
-        )
-
-# Show the plot
+# Add dashed lines and labels for charge and discharge (second plot)
+add_cycle_overlays(plt.gca(), cycles, x=unique_shifts_150_300[len(unique_shifts_150_300) // 2])
+
 plt.tight_layout()
+
+# ---- STEP 8: D and G Band Intensities over Time ----
+# Integrated intensity of each band in every spectrum, from one cumulative
+# integral of the 1000-1750 cm⁻¹ grid (see band_integrals)
+bands = BandIntegrals(unique_times, unique_shifts, intensity_matrix)
+band_windows = {"D": (1250, 1400), "G": (1500, 1650)}
+fig_bands, ax_bands = plt.subplots(figsize=(10, 4))
+plot_band_traces(ax_bands, unique_times, bands.integrals(band_windows), list(band_windows), cycles=cycles)
+ax_bands.set_title("D and G band intensity")
+fig_bands.tight_layout()
+
+# Show the plots
 plt.show()